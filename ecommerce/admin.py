@@ -1,34 +1,113 @@
 from django.contrib import admin
-from .models import Product, Order, OrderItem, Review
+from .models import Product, Order, OrderItem, Review, StockReservation, Job, APIKey
+from .pagination import EstimatedCountPaginator
+from . import apikeys, search
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Changelists that stay fast on million-row tables: counts are estimated,
+    the unfiltered total isn't counted a second time, and searches only use
+    indexes. A number is looked up in ``id_search_field``; with
+    ``product_search_field`` set, other terms go through the product
+    full-text index, otherwise through ``search_fields``, which should be
+    exact lookups on indexed columns.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    id_search_field = 'pk'
+    product_search_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if self.id_search_field and term.isdigit():
+            return queryset.filter(**{self.id_search_field: int(term)}), False
+        if self.product_search_field is None:
+            return super().get_search_results(request, queryset, term)
+        return queryset.filter(search.matching_products(self.product_search_field, term, queryset.db)), False
 
 # Basic admin registration
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'category', 'stock_count')
+class ProductAdmin(ScalableModelAdmin):
+    list_display = ('name', 'price', 'category', 'stock_count', 'created_at')
     list_filter = ('category',)
     search_fields = ('name', 'description')
+    product_search_field = 'pk'
+    date_hierarchy = 'created_at'
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ('product',)
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableModelAdmin):
     list_display = ('id', 'user', 'status', 'total_amount', 'created_at')
     list_filter = ('status',)
-    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    search_fields = ('user__username__exact', 'tracking_number__exact')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user',)
     inlines = [OrderItemInline]
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(ScalableModelAdmin):
     list_display = ('product', 'user', 'rating', 'date')
     list_filter = ('rating',)
-    search_fields = ('product__name', 'user__username')
+    list_select_related = ('product', 'user')
+    search_fields = ('product__name',)
+    product_search_field = 'product'
+    autocomplete_fields = ('product',)
+    raw_id_fields = ('user',)
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ScalableModelAdmin):
     list_display = ('order', 'product', 'quantity', 'price')
-    search_fields = ('order__id', 'product__name')
+    # Order.__str__ shows the username
+    list_select_related = ('order__user', 'product')
+    search_fields = ('product__name',)
+    id_search_field = 'order_id'
+    product_search_field = 'product'
+    date_hierarchy = 'order__created_at'
+    autocomplete_fields = ('product',)
+    raw_id_fields = ('order',)
+
+@admin.register(StockReservation)
+class StockReservationAdmin(ScalableModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'status', 'expires_at')
+    list_filter = ('status',)
+    list_select_related = ('order__user', 'product')
+    search_fields = ('product__name',)
+    id_search_field = 'order_id'
+    product_search_field = 'product'
+    raw_id_fields = ('order', 'product')
+
+@admin.register(Job)
+class JobAdmin(ScalableModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'task')
+
+@admin.register(APIKey)
+class APIKeyAdmin(ScalableModelAdmin):
+    list_display = ('prefix', 'user', 'name', 'created_at', 'expires_at', 'revoked_at', 'last_used_at')
+    list_filter = ('revoked_at',)
+    list_select_related = ('user',)
+    search_fields = ('prefix__exact', 'user__username__exact')
+    id_search_field = None
+    raw_id_fields = ('user',)
+    # Keys are issued with manage.py create_api_key, which shows the secret once
+    readonly_fields = ('prefix', 'key_hash', 'created_at', 'last_used_at')
+    actions = ['revoke_keys']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Revoke selected API keys')
+    def revoke_keys(self, request, queryset):
+        for api_key in queryset.filter(revoked_at__isnull=True):
+            apikeys.revoke(api_key)
 
 """
 # Commented out custom admin code
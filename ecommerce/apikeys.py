@@ -0,0 +1,152 @@
+"""
+API key authentication. Keys look like ``<prefix>.<secret>``: the prefix
+is stored in clear and indexed, the whole key only as a SHA-256 hash. Keys
+are long random strings, so a fast hash is enough, unlike passwords, which
+Basic auth re-hashes with PBKDF2 on every request.
+
+Verified keys are kept in a small per-process cache for
+``API_KEY_CACHE_TTL`` seconds. Revoking or editing a key (or its user)
+drops it from the cache of the process that made the change; other worker
+processes notice within the TTL.
+"""
+import copy
+import hashlib
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import APIKey
+
+KEYWORD = 'Api-Key'
+PREFIX_BYTES = 6
+SECRET_BYTES = 32
+MAX_CACHED_KEYS = 10_000
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def generate_key():
+    """Return a new ``(prefix, key)`` pair."""
+    prefix = secrets.token_hex(PREFIX_BYTES)
+    return prefix, f'{prefix}.{secrets.token_urlsafe(SECRET_BYTES)}'
+
+
+def create_key(user, name='', expires_at=None):
+    """
+    Create a key for ``user`` and return ``(api_key, key)``. The plain key
+    can't be recovered later, so show it to the user now.
+    """
+    prefix, key = generate_key()
+    api_key = APIKey.objects.create(
+        user=user, name=name, prefix=prefix, key_hash=hash_key(key), expires_at=expires_at
+    )
+    return api_key, key
+
+
+def revoke(api_key, now=None):
+    api_key.revoked_at = now or timezone.now()
+    api_key.save(update_fields=['revoked_at'])
+
+
+def is_usable(api_key, now=None):
+    now = now or timezone.now()
+    return (
+        api_key.revoked_at is None
+        and (api_key.expires_at is None or api_key.expires_at > now)
+        and api_key.user.is_active
+    )
+
+
+def forget(prefix=None, user_id=None):
+    """Drop cached verifications for one key prefix, or all keys of a user."""
+    with _lock:
+        if prefix is not None:
+            _cache.pop(prefix, None)
+        if user_id is not None:
+            for cached_prefix, (_, api_key, _) in list(_cache.items()):
+                if api_key.user_id == user_id:
+                    del _cache[cached_prefix]
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def _cached(prefix):
+    with _lock:
+        entry = _cache.get(prefix)
+    if entry is None or entry[2] < time.monotonic():
+        return None
+    return entry
+
+
+def _remember(prefix, digest, api_key):
+    with _lock:
+        if prefix not in _cache and len(_cache) >= MAX_CACHED_KEYS:
+            # Dicts keep insertion order, so this evicts the oldest entry
+            del _cache[next(iter(_cache))]
+        _cache[prefix] = (digest, api_key, time.monotonic() + settings.API_KEY_CACHE_TTL)
+
+
+def verify(key):
+    """Return the usable APIKey matching ``key``, or None."""
+    prefix, _, secret = key.partition('.')
+    if not prefix or not secret:
+        return None
+    digest = hash_key(key)
+    entry = _cached(prefix)
+    if entry is not None:
+        # A key's hash never changes, so wrong secrets are rejected here too
+        cached_digest, api_key, _ = entry
+        return api_key if constant_time_compare(cached_digest, digest) and is_usable(api_key) else None
+
+    api_key = APIKey.objects.select_related('user').filter(prefix=prefix).first()
+    if api_key is None or not constant_time_compare(api_key.key_hash, digest) or not is_usable(api_key):
+        return None
+    # Only written on cache misses, so at most once per TTL per process
+    api_key.last_used_at = timezone.now()
+    APIKey.objects.filter(pk=api_key.pk).update(last_used_at=api_key.last_used_at)
+    _remember(prefix, digest, api_key)
+    return api_key
+
+
+class APIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticate ``Authorization: Api-Key <key>`` requests. ``request.auth``
+    is the APIKey.
+    """
+    keyword = KEYWORD
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+        try:
+            key = auth[1].decode('ascii')
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+
+        api_key = verify(key)
+        if api_key is None:
+            raise exceptions.AuthenticationFailed('Invalid or revoked API key.')
+        # The cached instances are shared between requests and threads
+        api_key = copy.copy(api_key)
+        api_key.user = copy.copy(api_key.user)
+        return api_key.user, api_key
+
+    def authenticate_header(self, request):
+        return self.keyword
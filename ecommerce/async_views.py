@@ -0,0 +1,100 @@
+"""
+Async versions of the catalog and order read endpoints.
+
+They run natively under ASGI (see gunicorn_asgi.py) and use Django's async
+ORM, so a slow query waits on the event loop instead of holding a whole
+worker. Responses match the DRF endpoints under /api/products/ and
+/api/orders/.
+"""
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import filter_product_list, filter_product_search
+from .models import Product, Order, OrderItem
+from .renderers import FastJSONRenderer
+from .serializers import ProductSummarySerializer, ProductDetailSerializer, OrderStatusSerializer
+from .views import ProductPagination
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json')
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET[ProductPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return ProductPagination.page_size
+    if size <= 0:
+        return ProductPagination.page_size
+    return min(size, ProductPagination.max_page_size)
+
+
+async def paginated_summary_response(request, queryset):
+    """Page-number pagination with the same shape and links as ProductPagination."""
+    page_size = _page_size(request)
+    try:
+        page = int(request.GET.get('page', 1))
+        if page < 1:
+            raise ValueError
+    except ValueError:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    count = await queryset.order_by().acount()
+    pages = max(1, -(-count // page_size))
+    if page > pages:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    start = (page - 1) * page_size
+    rows = ProductSummarySerializer.values_queryset(queryset)[start:start + page_size]
+    results = ProductSummarySerializer.fast_data([row async for row in rows])
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', page + 1) if page < pages else None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', page - 1)
+
+    return json_response({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': results,
+    })
+
+
+async def product_list(request):
+    queryset = filter_product_list(Product.objects.all(), request.GET)
+    return await paginated_summary_response(request, queryset)
+
+
+async def product_search(request):
+    queryset = filter_product_search(Product.objects.all(), request.GET)
+    return await paginated_summary_response(request, queryset)
+
+
+async def product_detail(request, pk):
+    try:
+        product = await Product.objects.aget(pk=pk)
+    except Product.DoesNotExist:
+        return json_response({'detail': 'No Product matches the given query.'}, status=404)
+    reviews = [review async for review in ProductDetailSerializer.preview_reviews(pk)]
+    serializer = ProductDetailSerializer(product, context={'preview_reviews': reviews})
+    return json_response(serializer.data)
+
+
+async def order_detail(request, pk):
+    queryset = Order.objects.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+    try:
+        order = await queryset.aget(pk=pk)
+    except Order.DoesNotExist:
+        return json_response({'detail': 'No Order matches the given query.'}, status=404)
+    return json_response(OrderStatusSerializer(order).data)
@@ -0,0 +1,156 @@
+"""
+Indexed product attributes. ``Product.specifications`` is free-form JSON;
+each scalar in it becomes a ProductAttribute row (nested objects become
+dotted keys, lists one row per item), so the list and search endpoints can
+filter on specs through an index:
+
+    ?spec.brand=acme&spec.brand=globex   any of the values
+    ?spec.ram__gte=8&spec.ram__lte=32    numeric range on the leading number
+
+Keys and values are matched case-insensitively.
+"""
+import json
+import re
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, ProductAttribute
+
+PARAM_PREFIX = 'spec.'
+RANGE_LOOKUPS = ('gte', 'lte', 'gt', 'lt')
+MAX_ATTRIBUTES = 100
+MAX_KEY_LENGTH = 100
+MAX_VALUE_LENGTH = 255
+
+NUMBER_RE = re.compile(r'^\s*([-+]?\d+(?:\.\d+)?)')
+
+
+def normalize_key(key):
+    return str(key).strip().lower()[:MAX_KEY_LENGTH]
+
+
+def normalize_value(value):
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    return str(value).strip().lower()[:MAX_VALUE_LENGTH]
+
+
+def leading_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_RE.match(str(value))
+    return float(match.group(1)) if match else None
+
+
+def _flatten(value, key):
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            yield from _flatten(child, f'{key}.{child_key}' if key else str(child_key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten(item, key)
+    elif value is not None and key:
+        yield key, value
+
+
+def extract_attributes(specifications):
+    """
+    Return ``(key, value, num_value)`` tuples for a specifications value,
+    de-duplicated and capped at MAX_ATTRIBUTES.
+    """
+    if isinstance(specifications, str):
+        try:
+            specifications = json.loads(specifications)
+        except ValueError:
+            return []
+    if not isinstance(specifications, dict):
+        return []
+    attributes = {}
+    for key, value in _flatten(specifications, ''):
+        pair = (normalize_key(key), normalize_value(value))
+        if pair[0] and pair[1] and pair not in attributes:
+            attributes[pair] = leading_number(value)
+            if len(attributes) >= MAX_ATTRIBUTES:
+                break
+    return [(key, value, number) for (key, value), number in attributes.items()]
+
+
+def index_products(products, replace=True):
+    """Write the attribute rows of ``products``, replacing their old rows."""
+    products = list(products)
+    with transaction.atomic():
+        if replace:
+            ProductAttribute.objects.filter(product__in=[product.pk for product in products]).delete()
+        ProductAttribute.objects.bulk_create([
+            ProductAttribute(product_id=product.pk, key=key, value=value, num_value=number)
+            for product in products
+            for key, value, number in extract_attributes(product.specifications)
+        ], batch_size=2000)
+
+
+def index_product(product):
+    index_products([product])
+
+
+def rebuild_index(batch_size=2000):
+    """Drop every attribute row and re-extract the whole catalog in batches."""
+    ProductAttribute.objects.all().delete()
+    total = 0
+    batch = []
+    queryset = Product.objects.only('id', 'specifications').order_by('pk')
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch, replace=False)
+            total += len(batch)
+            batch = []
+    index_products(batch, replace=False)
+    return total + len(batch)
+
+
+def _number(param, value):
+    try:
+        return float(value)
+    except ValueError:
+        raise ValidationError({param: ['A number is required.']})
+
+
+def spec_conditions(params):
+    """
+    Group the ``spec.<key>`` and ``spec.<key>__<gte|lte|gt|lt>`` parameters
+    of ``params`` (a QueryDict) by attribute key.
+    """
+    conditions = {}
+    for param in params:
+        if not param.startswith(PARAM_PREFIX):
+            continue
+        key, _, lookup = param[len(PARAM_PREFIX):].rpartition('__')
+        if lookup not in RANGE_LOOKUPS:
+            key, lookup = param[len(PARAM_PREFIX):], None
+        key = normalize_key(key)
+        values = [value for value in params.getlist(param) if value != '']
+        if not key or not values:
+            continue
+        condition = conditions.setdefault(key, {})
+        if lookup is None:
+            condition.setdefault('value__in', set()).update(normalize_value(value) for value in values)
+        else:
+            # Repeating a bound keeps the tightest one
+            numbers = [_number(param, value) for value in values]
+            condition[f'num_value__{lookup}'] = max(numbers) if lookup in ('gte', 'gt') else min(numbers)
+    return conditions
+
+
+def filter_by_specs(queryset, params):
+    """
+    Restrict ``queryset`` to products matching every spec filter in
+    ``params``. Each key is one subquery on the attribute table, answered
+    from the (key, value) or (key, num_value) index.
+    """
+    for key, condition in spec_conditions(params).items():
+        attributes = ProductAttribute.objects.filter(key=key, **condition)
+        queryset = queryset.filter(pk__in=attributes.values('product_id'))
+    return queryset
@@ -0,0 +1,244 @@
+"""
+Benchmark support: a reproducible synthetic catalog, the request scenarios
+run by ``manage.py benchmark``, and comparison against a stored baseline.
+"""
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import attributes, rollups, search
+from .loadgen import summarize
+from .models import Product, Review, Order, OrderItem
+from .ratings import reconcile_ratings
+
+ADJECTIVES = ['compact', 'classic', 'wireless', 'organic', 'premium', 'portable', 'vintage', 'smart']
+NOUNS = ['lamp', 'headphones', 'backpack', 'kettle', 'notebook', 'sneakers', 'camera', 'blender']
+BRANDS = ['acme', 'globex', 'initech', 'umbrella', 'hooli', 'stark']
+COLORS = ['black', 'white', 'red', 'blue', 'green']
+ORDER_STATUSES = ['pending', 'confirmed', 'shipped', 'delivered', 'delivered', 'cancelled']
+CATEGORIES = [value for value, _ in Product.CATEGORY_CHOICES]
+# Client-run results at the default seed, checked in so every checkout has
+# something to compare against. Re-save it when a change is meant to move it.
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+
+def _backdate(model, created_at):
+    """Spread rows over past days, which auto_now_add doesn't allow on insert."""
+    model.objects.filter(pk__in=list(created_at)).update(created_at=Case(
+        *[When(pk=pk, then=Value(moment)) for pk, moment in created_at.items()],
+        output_field=DateTimeField()
+    ))
+
+
+def seed_catalog(products=10_000, reviews_per_product=2, orders=5_000, seed=42,
+                 batch_size=5_000, days=90, log=None):
+    """
+    Insert a synthetic catalog with ``bulk_create``, then rebuild the
+    derived data (search and attribute indexes, rating counters, sales rollups) the same
+    way the maintenance commands do. The same ``seed`` gives the same data.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    log = log or (lambda message: None)
+
+    buyer = User.objects.filter(pk=1).first() or User.objects.create(id=1, username='bench-buyer')
+    reviewers = User.objects.bulk_create([
+        User(username=f'bench-reviewer-{seed}-{i}') for i in range(50)
+    ])
+
+    product_ids = []
+    for start in range(0, products, batch_size):
+        with transaction.atomic():
+            batch = Product.objects.bulk_create([
+                Product(
+                    name=f'{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS)} {i}',
+                    description=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} by {rng.choice(BRANDS)}',
+                    price=Decimal(rng.randint(100, 50_000)) / 100,
+                    category=rng.choice(CATEGORIES),
+                    stock_count=0 if rng.random() < 0.05 else rng.randint(1, 10_000),
+                    specifications={'brand': rng.choice(BRANDS), 'color': rng.choice(COLORS)},
+                )
+                for i in range(start, min(start + batch_size, products))
+            ])
+            product_ids.extend(product.pk for product in batch)
+            Review.objects.bulk_create([
+                Review(product=product, user=rng.choice(reviewers), rating=rng.randint(1, 5))
+                for product in batch
+                for _ in range(rng.randint(0, reviews_per_product * 2))
+            ], batch_size=batch_size)
+        log(f'products: {len(product_ids)}/{products}')
+
+    prices = {}
+    for start in range(0, orders, batch_size):
+        with transaction.atomic():
+            count = min(batch_size, orders - start)
+            lines = [
+                [(rng.choice(product_ids), rng.randint(1, 3)) for _ in range(rng.randint(1, 3))]
+                for _ in range(count)
+            ]
+            wanted = {product_id for order_lines in lines for product_id, _ in order_lines}
+            prices.update(Product.objects.filter(pk__in=wanted).values_list('pk', 'price'))
+            batch = Order.objects.bulk_create([
+                Order(
+                    user=buyer,
+                    status=rng.choice(ORDER_STATUSES),
+                    total_amount=sum(prices[product_id] * quantity for product_id, quantity in order_lines),
+                )
+                for order_lines in lines
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_id, quantity=quantity,
+                          price=prices[product_id] * quantity)
+                for order, order_lines in zip(batch, lines)
+                for product_id, quantity in order_lines
+            ])
+            _backdate(Order, {
+                order.pk: now - timedelta(days=rng.randint(0, days), seconds=rng.randint(0, 86_399))
+                for order in batch
+            })
+        log(f'orders: {min(start + batch_size, orders)}/{orders}')
+
+    if search.is_supported():
+        search.rebuild_index()
+    attributes.rebuild_index()
+    reconcile_ratings()
+    rollups.rebuild_rollups()
+    log('rebuilt search and attribute indexes, rating counters and sales rollups')
+
+
+def scenarios(rng, sample_size=200):
+    """
+    (name, method, path, body) factories for each benchmarked endpoint,
+    drawing ids from a fixed-size random sample of existing rows.
+    """
+    def sample(queryset):
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        return rng.sample(ids, min(sample_size, len(ids)))
+
+    product_ids = sample(Product.objects.all())
+    in_stock = sample(Product.objects.filter(stock_count__gt=100))
+    order_ids = sample(Order.objects.all())
+    pick = lambda ids: rng.choice(ids) if ids else 0
+    # Stay within the first 20 pages of 20 products that exist
+    pages = max(1, min(20, Product.objects.count() // 20))
+
+    return [
+        ('product-list', lambda: ('GET', f'/api/products/?page={rng.randint(1, pages)}', None)),
+        ('product-list-category', lambda: (
+            'GET', f'/api/products/?category={rng.choice(CATEGORIES)}&ordering=price', None
+        )),
+        ('product-search', lambda: (
+            'GET', f'/api/products/search/?q={rng.choice(NOUNS)}&min_price={rng.randint(1, 100)}', None
+        )),
+        ('product-list-spec', lambda: (
+            'GET', f'/api/products/?spec.brand={rng.choice(BRANDS)}&spec.color={rng.choice(COLORS)}', None
+        )),
+        ('product-retrieve', lambda: ('GET', f'/api/products/{pick(product_ids)}/', None)),
+        ('order-create', lambda: ('POST', '/api/orders/', {
+            'products': [{'product_id': pick(in_stock), 'quantity': 1}]
+        })),
+        ('order-retrieve', lambda: ('GET', f'/api/orders/{pick(order_ids)}/', None)),
+        ('dashboard', lambda: ('GET', '/api/admin/dashboard/', None)),
+    ]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _send(client, make_request):
+    method, path, body = make_request()
+    if method == 'POST':
+        return client.post(path, json.dumps(body), content_type='application/json')
+    return client.get(path)
+
+
+def _measure(client, make_request, requests):
+    latencies, errors, queries = [], 0, 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = _send(client, make_request)
+            latency = time.perf_counter() - request_started
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(latency)
+        queries = max(queries, len(captured))
+    return dict(summarize(latencies, errors, time.perf_counter() - started), queries=queries)
+
+
+def run_client_benchmark(requests=200, rounds=3, warmup=20, seed=42, only=None, log=None):
+    """
+    Drive every scenario through the Django test client and return
+    throughput, latency percentiles and the most queries seen in one
+    request, per scenario. Each scenario is warmed up, then measured
+    ``rounds`` times and the fastest round kept, which filters out most
+    noise from other processes. Everything runs in a transaction that is
+    rolled back, so orders created by the benchmark don't stay behind.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    client = Client()
+    results = {}
+    try:
+        with transaction.atomic():
+            for name, make_request in scenarios(rng):
+                if only and name not in only:
+                    continue
+                for _ in range(warmup):
+                    _send(client, make_request)
+                measured = [_measure(client, make_request, requests) for _ in range(max(1, rounds))]
+                best = max(measured, key=lambda result: result['throughput'])
+                best['queries'] = max(result['queries'] for result in measured)
+                results[name] = best
+                log(format_row(name, best))
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+def format_row(name, result):
+    return (
+        f"{name:<24} {result['throughput']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+        f"{result['p99_ms']:>8.1f} {result.get('queries', '-'):>7} {result['errors']:>6}"
+    )
+
+
+HEADER = f"{'scenario':<24} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'errors':>6}"
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Return a message for every scenario that regressed against
+    ``baseline``: throughput down or p95 up by more than ``tolerance``,
+    more queries per request, or new errors.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput']:.1f} req/s, baseline {before['throughput']:.1f}"
+            )
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {before['p95_ms']:.1f}")
+        if 'queries' in before and result.get('queries', 0) > before['queries']:
+            regressions.append(f"{name}: {result['queries']} queries per request, baseline {before['queries']}")
+        if result['errors'] > before.get('errors', 0):
+            regressions.append(f"{name}: {result['errors']} errors, baseline {before.get('errors', 0)}")
+    return regressions
@@ -0,0 +1,163 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'catalog'
+KEY_PREFIX = 'catalog'
+ALL_SCOPE = 'all'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def is_enabled():
+    return CACHE_ALIAS in settings.CACHES
+
+
+def category_scope(category):
+    return f'cat:{category or ""}'
+
+
+def product_scope(product_id):
+    return f'product:{product_id}'
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:v:{scope}'
+
+
+def get_versions(scopes):
+    """
+    Return the current version stamp of each scope. Stamps are nanosecond
+    timestamps rather than counters so a stamp lost to eviction can never
+    be recreated with an old value and revive stale entries.
+    """
+    cache = get_cache()
+    keys = {_version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(list(keys))
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    if not is_enabled() or not scopes:
+        return
+    stamp = time.time_ns()
+    get_cache().set_many({_version_key(scope): stamp for scope in set(scopes)}, timeout=None)
+
+
+def invalidate(*scopes):
+    """Bump ``scopes`` once the current transaction commits."""
+    if is_enabled() and scopes:
+        transaction.on_commit(lambda: bump(*scopes))
+
+
+def invalidate_products(products):
+    scopes = {ALL_SCOPE}
+    for product in products:
+        scopes.add(product_scope(product.pk))
+        scopes.add(category_scope(product.category))
+    invalidate(*scopes)
+
+
+def _record(outcome):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:stats:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    cache = get_cache()
+    counters = cache.get_many([f'{KEY_PREFIX}:stats:{name}' for name in ('hit', 'miss', 'not_modified')])
+    return {
+        name: counters.get(f'{KEY_PREFIX}:stats:{name}', 0)
+        for name in ('hit', 'miss', 'not_modified')
+    }
+
+
+def request_scopes(request, pk=None, whole_catalog=False):
+    if whole_catalog:
+        return [ALL_SCOPE]
+    if pk is not None:
+        return [product_scope(pk)]
+    category = request.query_params.get('category')
+    if category:
+        return [category_scope(category)]
+    return [ALL_SCOPE]
+
+
+def request_key(endpoint, request, pk=None, whole_catalog=False):
+    """
+    Build the cache key and ETag for a catalog read from the endpoint, the
+    normalized query string and the version stamps of the scopes it
+    depends on. The host is included because pagination links are absolute.
+    """
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+        if any(values)
+    )
+    versions = get_versions(request_scopes(request, pk, whole_catalog))
+    raw = repr((endpoint, pk, request.build_absolute_uri('/'), params, versions))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:resp:{endpoint}:{digest}', f'"{digest}"'
+
+
+def _if_none_match(request):
+    # Weak comparison, since compressed responses carry a weak W/ ETag
+    header = request.headers.get('If-None-Match', '')
+    return [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def cached_catalog_response(endpoint, whole_catalog=False):
+    """
+    Cache successful GET responses of a catalog view. A request whose
+    If-None-Match matches the current ETag gets a 304 without touching the
+    database or serializing anything. Set ``whole_catalog`` for views whose
+    output depends on every product even when filtered by category.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or not is_enabled():
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            key, etag = request_key(endpoint, request, kwargs.get('pk'), whole_catalog)
+            if_none_match = _if_none_match(request)
+            if etag in if_none_match:
+                _record('not_modified')
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            data = cache.get(key)
+            if data is not None:
+                # Only a cached 200 proves the resource exists, which "*" asks about
+                if '*' in if_none_match:
+                    _record('not_modified')
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+                _record('hit')
+                return Response(data, headers={'ETag': etag, 'X-Cache': 'HIT'})
+
+            _record('miss')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+                response['ETag'] = etag
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,136 @@
+"""
+Content-Encoding negotiation and compressors for the response
+compression middleware. Brotli is used when the ``brotli`` package is
+installed; gzip always works.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the install
+    brotli = None
+
+# Types worth compressing; images, fonts in woff/woff2 and archives already are
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'image/svg+xml',
+    'text/',
+)
+# HTML pages carry CSRF tokens, which compression would expose to BREACH
+EXCLUDED_TYPES = ('text/html',)
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Supported encodings, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def is_compressible_type(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header, encodings=None):
+    """
+    Return the best of ``encodings`` (default: every supported one, in
+    order of preference) that the client accepts, or None for identity.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings if encodings is not None else available_encodings():
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output the same for the same input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed responses. Output is flushed about
+    every ``FLUSH_BYTES`` of input, so a long export keeps reaching the
+    client without giving up compression on small chunks like CSV rows.
+    """
+    FLUSH_BYTES = 64 * 1024
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.pending = 0
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        self.pending += len(chunk)
+        if self.encoding == 'br':
+            data = self.compressor.process(chunk)
+            if self.pending >= self.FLUSH_BYTES:
+                data += self.compressor.flush()
+                self.pending = 0
+            return data
+        data = self.compressor.compress(chunk)
+        if self.pending >= self.FLUSH_BYTES:
+            data += self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.pending = 0
+        return data
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.feed(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.feed(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
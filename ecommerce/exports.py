@@ -0,0 +1,132 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+OUTPUT_FORMATS = ('ndjson', 'csv')
+
+PRODUCT_FIELDS = [
+    'id', 'name', 'description', 'price', 'category', 'thumbnail', 'stock_count',
+    'specifications', 'images', 'rating_avg', 'rating_count', 'created_at', 'updated_at',
+]
+# Payment details never leave the database through exports
+ORDER_FIELDS = [
+    'id', 'user_id', 'status', 'total_amount', 'shipping_address',
+    'tracking_number', 'carrier', 'estimated_delivery', 'created_at', 'updated_at',
+]
+ORDER_ITEM_FIELDS = ['product_id', 'quantity', 'price']
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _json(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def _csv_cell(value):
+    if isinstance(value, (dict, list)):
+        return _json(value)
+    if hasattr(value, 'isoformat'):
+        return DjangoJSONEncoder().default(value)
+    return value
+
+
+def export_queryset(queryset):
+    # Oldest change first, so a sync can resume from the last updated_at seen
+    return queryset.order_by('updated_at', 'id')
+
+
+def iter_products_ndjson(queryset):
+    rows = export_queryset(queryset).values(*PRODUCT_FIELDS)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _json(row) + '\n'
+
+
+def iter_products_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(PRODUCT_FIELDS)
+    rows = export_queryset(queryset).values_list(*PRODUCT_FIELDS)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _orders_with_items(queryset):
+    items = OrderItem.objects.only('order_id', *ORDER_ITEM_FIELDS).order_by('id')
+    return export_queryset(queryset).only(*ORDER_FIELDS).prefetch_related(
+        Prefetch('items', queryset=items)
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_orders_ndjson(queryset):
+    for order in _orders_with_items(queryset):
+        row = {field: getattr(order, field) for field in ORDER_FIELDS}
+        row['items'] = [
+            {field: getattr(item, field) for field in ORDER_ITEM_FIELDS}
+            for item in order.items.all()
+        ]
+        yield _json(row) + '\n'
+
+
+def iter_orders_csv(queryset):
+    """One row per order item, with the order columns repeated."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(ORDER_FIELDS + [f'item_{field}' for field in ORDER_ITEM_FIELDS])
+    for order in _orders_with_items(queryset):
+        order_cells = [_csv_cell(getattr(order, field)) for field in ORDER_FIELDS]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(order_cells + [''] * len(ORDER_ITEM_FIELDS))
+        for item in items:
+            yield writer.writerow(
+                order_cells + [_csv_cell(getattr(item, field)) for field in ORDER_ITEM_FIELDS]
+            )
+
+
+def export_response(request, queryset, ndjson_writer, csv_writer, filename):
+    """
+    Stream ``queryset`` as NDJSON (default) or CSV, chosen with ``?output=``.
+    ``?updated_since=<ISO 8601>`` limits the export to rows changed since
+    then, for incremental syncs.
+    """
+    output = request.query_params.get('output', 'ndjson')
+    if output not in OUTPUT_FORMATS:
+        return Response(
+            {'error': f"output must be one of: {', '.join(OUTPUT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    updated_since = request.query_params.get('updated_since')
+    if updated_since:
+        try:
+            since = parse_datetime(updated_since)
+        except ValueError:
+            since = None
+        if since is None:
+            return Response(
+                {'error': 'updated_since must be an ISO 8601 datetime'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        queryset = queryset.filter(updated_at__gte=since)
+
+    if output == 'csv':
+        response = StreamingHttpResponse(csv_writer(queryset), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    else:
+        response = StreamingHttpResponse(ndjson_writer(queryset), content_type='application/x-ndjson')
+    return response
@@ -0,0 +1,57 @@
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+from .models import Product
+
+# Upper bounds of the price histogram buckets; the last bucket is open-ended
+PRICE_BOUNDARIES = (25, 50, 100, 250, 500, 1000)
+
+
+def price_bucket():
+    return Case(
+        *[When(price__lt=bound, then=Value(index)) for index, bound in enumerate(PRICE_BOUNDARIES)],
+        default=Value(len(PRICE_BOUNDARIES)),
+        output_field=IntegerField()
+    )
+
+
+def product_facets(queryset, category=None):
+    """
+    Count ``queryset`` by category and price bucket in one grouped query.
+
+    ``queryset`` should not be filtered on category: the category counts
+    cover every category so the other choices stay visible, while the total,
+    the in-stock count and the price histogram are for ``category`` when one
+    is selected.
+    """
+    rows = (
+        queryset.order_by()
+        .values('category', bucket=price_bucket())
+        .annotate(count=Count('id'), in_stock=Count('id', filter=Q(stock_count__gt=0)))
+    )
+
+    categories = {value: {'count': 0, 'in_stock': 0} for value, _ in Product.CATEGORY_CHOICES}
+    buckets = [{'count': 0, 'in_stock': 0} for _ in range(len(PRICE_BOUNDARIES) + 1)]
+    for row in rows:
+        counts = categories.setdefault(row['category'] or None, {'count': 0, 'in_stock': 0})
+        counts['count'] += row['count']
+        counts['in_stock'] += row['in_stock']
+        if not category or row['category'] == category:
+            buckets[row['bucket']]['count'] += row['count']
+            buckets[row['bucket']]['in_stock'] += row['in_stock']
+
+    labels = dict(Product.CATEGORY_CHOICES)
+    lower_bounds = (0,) + PRICE_BOUNDARIES
+    upper_bounds = PRICE_BOUNDARIES + (None,)
+    return {
+        'count': sum(bucket['count'] for bucket in buckets),
+        'in_stock': sum(bucket['in_stock'] for bucket in buckets),
+        'categories': [
+            {'value': value, 'label': labels.get(value, 'Uncategorized'), **counts}
+            for value, counts in categories.items()
+            if value in labels or counts['count']
+        ],
+        'price_ranges': [
+            {'min': low, 'max': high, **counts}
+            for low, high, counts in zip(lower_bounds, upper_bounds, buckets)
+        ],
+    }
@@ -0,0 +1,48 @@
+from . import search as product_search
+from .attributes import filter_by_specs
+
+
+def filter_product_list(queryset, params):
+    """
+    Filters and ordering of the product list endpoint (``category``,
+    ``search``, ``spec.*``, ``ordering``).
+    """
+    category = params.get('category')
+    search = params.get('search')
+
+    if category:
+        queryset = queryset.filter(category=category)
+    if search:
+        queryset = product_search.search_products(queryset, search)
+    queryset = filter_by_specs(queryset, params)
+
+    ordering = params.get('ordering', '-created_at')
+    if ordering:
+        queryset = queryset.order_by(ordering)
+    return queryset
+
+
+def filter_product_search(queryset, params):
+    """
+    Filters of the product search endpoint (``q``, ``category``,
+    ``min_price``, ``max_price``, ``spec.*``).
+    """
+    query = params.get('q', '')
+    category = params.get('category')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+
+    if query:
+        # Ranked by relevance through the full-text index
+        queryset = product_search.search_products(queryset, query)
+
+    if category:
+        queryset = queryset.filter(category=category)
+
+    if min_price:
+        queryset = queryset.filter(price__gte=float(min_price))
+
+    if max_price:
+        queryset = queryset.filter(price__lte=float(max_price))
+
+    return filter_by_specs(queryset, params)
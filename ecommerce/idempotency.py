@@ -0,0 +1,91 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(endpoint, request):
+    payload = json.dumps([endpoint, request.data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lookup(key, now=None):
+    try:
+        return IdempotencyKey.objects.get(key=key, expires_at__gt=now or timezone.now())
+    except IdempotencyKey.DoesNotExist:
+        return None
+
+
+def replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def purge_expired(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+def idempotent_response(endpoint):
+    """
+    Make a POST view safe to retry with an ``Idempotency-Key`` header. The
+    first successful response is stored in the same transaction as the
+    view's writes; repeating the key replays it after one indexed lookup
+    instead of running the view again. Failed responses are not stored, so
+    retrying them runs the view again.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            fingerprint = request_fingerprint(endpoint, request)
+            now = timezone.now()
+            record = lookup(key, now)
+            if record is not None:
+                return replay(record, fingerprint)
+
+            try:
+                with transaction.atomic():
+                    # An expired record would still hold the unique key
+                    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+                    response = view_method(self, request, *args, **kwargs)
+                    if status.is_success(response.status_code):
+                        IdempotencyKey.objects.create(
+                            key=key,
+                            fingerprint=fingerprint,
+                            status_code=response.status_code,
+                            response=response.data,
+                            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                        )
+            except IntegrityError:
+                # A concurrent request with the same key committed first
+                record = lookup(key)
+                if record is None:
+                    raise
+                return replay(record, fingerprint)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,146 @@
+import csv
+import json
+
+from django.db import transaction
+
+from .models import Product
+from .serializers import ProductDetailSerializer
+from . import attributes, search
+from . import cache as catalog_cache
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+# Only the first errors are reported so a broken feed can't exhaust memory
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_CONTENT_TYPES = ('text/csv',)
+
+# CSV cells holding JSON documents rather than plain strings
+CSV_JSON_COLUMNS = ('specifications', 'images')
+
+
+class RowError(ValueError):
+    pass
+
+
+class ProductImportError(Exception):
+    def __init__(self, errors, error_count):
+        super().__init__(f'{error_count} invalid rows')
+        self.errors = errors
+        self.error_count = error_count
+
+
+def iter_ndjson(stream):
+    for raw in stream:
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield RowError('Invalid JSON')
+
+
+def iter_csv(stream):
+    lines = (raw.decode('utf-8') if isinstance(raw, bytes) else raw for raw in stream)
+    for record in csv.DictReader(lines):
+        row = {}
+        for key, value in record.items():
+            if key is None or value in ('', None):
+                continue
+            if key in CSV_JSON_COLUMNS:
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    row = RowError(f'Invalid JSON in column {key}')
+                    break
+            row[key] = value
+        yield row
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_products(rows, chunk_size=DEFAULT_CHUNK_SIZE, collect=False):
+    """
+    Validate and insert products from any iterable of dicts, ``chunk_size``
+    rows at a time, all inside one transaction. Every row is validated even
+    after the first failure so the error report is complete; if any row is
+    invalid nothing is written and ``ProductImportError`` is raised.
+
+    Returns the number of created products, plus the created instances when
+    ``collect`` is true.
+    """
+    created = 0
+    created_products = []
+    errors = []
+    error_count = 0
+    row_number = 0
+    categories = set()
+
+    with transaction.atomic():
+        for chunk in _chunks(rows, chunk_size):
+            offset = row_number
+            row_number += len(chunk)
+
+            valid_rows = []
+            for index, row in enumerate(chunk, start=offset + 1):
+                if isinstance(row, RowError):
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': index, 'errors': {'non_field_errors': [str(row)]}})
+                elif not isinstance(row, dict):
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': index, 'errors': {'non_field_errors': ['Expected an object']}})
+                else:
+                    valid_rows.append((index, row))
+
+            serializer = ProductDetailSerializer(data=[row for _, row in valid_rows], many=True)
+            if not serializer.is_valid():
+                for (index, _), row_errors in zip(valid_rows, serializer.errors):
+                    if row_errors:
+                        error_count += 1
+                        if len(errors) < MAX_REPORTED_ERRORS:
+                            errors.append({'row': index, 'errors': row_errors})
+
+            # Once anything failed the transaction is rolled back, so only
+            # keep validating to complete the error report
+            if error_count:
+                continue
+
+            products = Product.objects.bulk_create(
+                [Product(**data) for data in serializer.validated_data],
+                batch_size=chunk_size
+            )
+            search.index_products(products)
+            attributes.index_products(products, replace=False)
+            categories.update(product.category for product in products)
+            created += len(products)
+            if collect:
+                created_products.extend(products)
+
+        if error_count:
+            errors.sort(key=lambda error: error['row'])
+            raise ProductImportError(errors, error_count)
+        # New products have no cached detail responses, so only the listings
+        # they appear in need invalidating. Once for the whole import, so
+        # nothing held until commit grows with the number of rows.
+        if created:
+            catalog_cache.invalidate(
+                catalog_cache.ALL_SCOPE, *(catalog_cache.category_scope(category) for category in categories)
+            )
+
+    if collect:
+        return created, created_products
+    return created
@@ -0,0 +1,115 @@
+"""
+A small job queue stored in the ``Job`` table, so background work needs no
+broker. Functions registered with ``@task`` are queued with ``enqueue`` and
+run by ``manage.py runworker``.
+
+A job enqueued inside a transaction is only visible to workers once that
+transaction commits, and disappears with it on rollback.
+"""
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+# Running jobs whose worker hasn't finished them in this many seconds are
+# assumed lost with a crashed worker and queued again
+STALE_AFTER = 15 * 60
+
+TASKS = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(name=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register a function as a task. It is called with the job payload as keyword arguments."""
+    def decorator(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        TASKS[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(task, delay=0, **payload):
+    name = getattr(task, 'task_name', task)
+    func = TASKS.get(name)
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        max_attempts=getattr(func, 'max_attempts', DEFAULT_MAX_ATTEMPTS),
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """Exponential backoff with full jitter, in seconds."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)))
+
+
+def claim(worker, limit):
+    """
+    Mark up to ``limit`` due jobs as running for ``worker`` and return them.
+    The conditional UPDATE only takes jobs that are still queued, so two
+    workers claiming at once never get the same job.
+    """
+    now = timezone.now()
+    due = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not due:
+        return []
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    Job.objects.filter(pk__in=due, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=token, locked_at=now,
+        attempts=F('attempts') + 1, updated_at=now
+    )
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at', 'id'))
+
+
+def run(job):
+    """Run a claimed job, then mark it done, or queue a retry, or mark it failed."""
+    try:
+        func = TASKS.get(job.task)
+        if func is None:
+            raise UnknownTask(f'No task registered as {job.task!r}')
+        func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts or job.task not in TASKS:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    return job.status
+
+
+def requeue_stale(now=None):
+    cutoff = (now or timezone.now()) - timedelta(seconds=STALE_AFTER)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by='', locked_at=None, updated_at=timezone.now()
+    )
+
+
+def run_pending(worker='inline', limit=100):
+    """Claim and run due jobs one after another. Returns how many ran."""
+    jobs = claim(worker, limit)
+    for job in jobs:
+        run(job)
+    return len(jobs)
@@ -0,0 +1,115 @@
+import multiprocessing
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    completed = len(latencies)
+    return {
+        'requests': completed + errors,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': completed / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def _connect(parts, timeout):
+    connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+    return connection_class(parts.netloc, timeout=timeout)
+
+
+def _worker(url, count, timeout, headers, latencies, errors, lock):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    connection = _connect(parts, timeout)
+    local_latencies = []
+    local_errors = 0
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, HTTPException):
+            connection.close()
+            connection = _connect(parts, timeout)
+            ok = False
+        if ok:
+            local_latencies.append(time.perf_counter() - started)
+        else:
+            local_errors += 1
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def collect(url, requests=1000, concurrency=10, timeout=30, headers=None):
+    """
+    Fire ``requests`` GETs at ``url`` from ``concurrency`` threads, each on
+    its own keep-alive connection. Returns the raw latencies, the error
+    count and the elapsed wall time.
+    """
+    concurrency = max(1, min(concurrency, requests))
+    share, extra = divmod(requests, concurrency)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(url, share + (1 if i < extra else 0), timeout, headers, latencies, errors, lock)
+        )
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - started
+
+
+def run_load(url, requests=1000, concurrency=10, timeout=30, headers=None):
+    """Run ``collect`` and return throughput and latency percentiles."""
+    return summarize(*collect(url, requests, concurrency, timeout, headers))
+
+
+def _split(total, parts):
+    share, extra = divmod(total, parts)
+    return [share + (1 if i < extra else 0) for i in range(parts)]
+
+
+def run_load_processes(url, requests=1000, concurrency=10, processes=2, timeout=30, headers=None):
+    """
+    Like ``run_load``, but spread the threads over ``processes`` client
+    processes so the load generator itself isn't limited by one GIL.
+    """
+    processes = max(1, min(processes, concurrency, requests))
+    jobs = [
+        (url, count, threads, timeout, headers)
+        for count, threads in zip(_split(requests, processes), _split(concurrency, processes))
+    ]
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        results = pool.starmap(collect, jobs)
+    elapsed = time.perf_counter() - started
+    latencies = [latency for result in results for latency in result[0]]
+    return summarize(latencies, sum(result[1] for result in results), elapsed)
@@ -0,0 +1,71 @@
+import base64
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.authentication import BasicAuthentication
+
+from ecommerce.apikeys import APIKeyAuthentication, create_key
+from ecommerce.models import Product
+from ecommerce.views import ProductViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare authenticated requests/sec on the product list with Basic auth '
+        'against API keys. Seed rows are created inside a transaction that is rolled back, '
+        'and the catalog response cache is bypassed so every request runs the view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        repeat = options['repeat']
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+        try:
+            with override_settings(CACHES=caches, DATABASE_ROUTERS=[]), transaction.atomic():
+                Product.objects.bulk_create([
+                    Product(name=f'Bench product {i}', price=Decimal(i % 1000), category='books')
+                    for i in range(options['rows'])
+                ], batch_size=1000)
+                user = User.objects.create_user('bench-auth', password='bench-auth-password')
+                _, key = create_key(user, name='bench_auth')
+                basic = base64.b64encode(b'bench-auth:bench-auth-password').decode()
+
+                before = self.measure(BasicAuthentication, f'Basic {basic}', requests, repeat)
+                after = self.measure(APIKeyAuthentication, f'Api-Key {key}', requests, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'requests={requests} repeat={repeat}')
+        self.stdout.write(f'Basic auth: {before:,.1f} req/sec')
+        self.stdout.write(f'API key: {after:,.1f} req/sec')
+        self.stdout.write(self.style.SUCCESS(f'speedup: {after / before:.2f}x'))
+
+    def measure(self, authentication_class, header, requests, repeat):
+        view = ProductViewSet.as_view({'get': 'list'}, authentication_classes=[authentication_class])
+        factory = RequestFactory()
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(requests):
+                response = view(factory.get('/api/products/', HTTP_AUTHORIZATION=header))
+                response.render()
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return requests / best
@@ -0,0 +1,82 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from ecommerce.models import Product, Order, OrderItem
+from ecommerce.renderers import FastJSONRenderer
+from ecommerce.serializers import OrderStatusSerializer, ProductSummarySerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the encode throughput of DRF\'s JSONRenderer and FastJSONRenderer on '
+        'product list pages and order pages with Decimal and datetime values. Seed rows '
+        'are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        page_size = options['page_size']
+        repeat = options['repeat']
+
+        try:
+            with transaction.atomic():
+                products = Product.objects.bulk_create([
+                    Product(
+                        name=f'Bench product {i}',
+                        price=Decimal(i % 1000) + Decimal('0.99'),
+                        category='electronics' if i % 2 else 'books',
+                        stock_count=i % 4,
+                    )
+                    for i in range(rows)
+                ], batch_size=1000)
+                user = User.objects.create(username='bench-renderers')
+                orders = Order.objects.bulk_create([
+                    Order(user=user, total_amount=Decimal('19.98')) for _ in range(page_size)
+                ])
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=products[i], quantity=2, price=Decimal('19.98'))
+                    for i, order in enumerate(orders)
+                ])
+
+                queryset = ProductSummarySerializer.values_queryset(Product.objects.order_by('-created_at', '-id'))
+                pages = [
+                    {'count': rows, 'results': ProductSummarySerializer.fast_data(queryset[start:start + page_size])}
+                    for start in range(0, rows, page_size)
+                ]
+                order_page = {'results': OrderStatusSerializer(
+                    Order.objects.prefetch_related('items__product').order_by('-id'), many=True
+                ).data}
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'rows={rows} page_size={page_size} repeat={repeat}')
+        for label, data in [('product pages', pages), ('order page', [order_page] * len(pages))]:
+            before, size = self.measure(JSONRenderer(), data, repeat)
+            after, _ = self.measure(FastJSONRenderer(), data, repeat)
+            self.stdout.write(f'{label}: JSONRenderer {before:,.0f} pages/sec, '
+                              f'FastJSONRenderer {after:,.0f} pages/sec ({size / 1024:,.0f} KiB per pass)')
+            self.stdout.write(self.style.SUCCESS(f'{label} speedup: {after / before:.2f}x'))
+
+    def measure(self, renderer, pages, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            size = sum(len(renderer.render(page)) for page in pages)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return len(pages) / best, size
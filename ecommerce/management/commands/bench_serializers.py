@@ -0,0 +1,72 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ecommerce.models import Product
+from ecommerce.serializers import ProductSummarySerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of ProductSummarySerializer against its .values() fast path. '
+        'Seed rows are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        page_size = options['page_size']
+        repeat = options['repeat']
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create([
+                    Product(
+                        name=f'Bench product {i}',
+                        price=Decimal(i % 1000) + Decimal('0.99'),
+                        category='electronics' if i % 2 else 'books',
+                        stock_count=i % 4,
+                    )
+                    for i in range(rows)
+                ], batch_size=1000)
+                queryset = Product.objects.order_by('-created_at', '-id')
+                pages = [(start, start + page_size) for start in range(0, rows, page_size)]
+
+                def serializer_path():
+                    for start, end in pages:
+                        ProductSummarySerializer(queryset[start:end], many=True).data
+
+                def fast_path():
+                    values = ProductSummarySerializer.values_queryset(queryset)
+                    for start, end in pages:
+                        ProductSummarySerializer.fast_data(values[start:end])
+
+                before = self.measure(serializer_path, rows, repeat)
+                after = self.measure(fast_path, rows, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'rows={rows} page_size={page_size} repeat={repeat}')
+        self.stdout.write(f'ModelSerializer: {before:,.0f} rows/sec')
+        self.stdout.write(f'values() fast path: {after:,.0f} rows/sec')
+        self.stdout.write(self.style.SUCCESS(f'speedup: {after / before:.2f}x'))
+
+    def measure(self, func, rows, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return rows / best
@@ -0,0 +1,136 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from ecommerce import benchmarks
+from ecommerce.loadgen import run_load_processes
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the shop API. By default a throwaway test database is seeded with a '
+        'synthetic catalog and every scenario is driven through the Django test client. '
+        'With --url, GET scenarios are load tested over HTTP from several processes '
+        'against a running server instead. Client runs are compared against the '
+        'checked-in baseline (or --baseline) and exit with an error on a regression.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--reviews-per-product', type=int, default=2)
+        parser.add_argument('--orders', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument(
+            '--rounds', type=int, default=3,
+            help='Measure each client scenario this many times and keep the fastest'
+        )
+        parser.add_argument('--only', nargs='+', help='Scenario names to run')
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Leave the catalog response cache on (it is bypassed by default)'
+        )
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--baseline',
+            help=f'JSON file to compare against (client runs default to {benchmarks.BASELINE_PATH.name})'
+        )
+        parser.add_argument('--no-baseline', action='store_true', help='Skip the regression check')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed fractional drop in throughput or rise in p95 before failing'
+        )
+
+    def handle(self, *args, **options):
+        baseline = self.load_baseline(options)
+        self.stdout.write(benchmarks.HEADER)
+        if options['url']:
+            results = self.run_http(options)
+        else:
+            results = self.run_client(options)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save_baseline']}")
+
+        if baseline is not None:
+            regressions = benchmarks.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def load_baseline(self, options):
+        """
+        Read the baseline up front so a missing file fails before the
+        catalog is seeded. HTTP numbers aren't comparable with the checked-in
+        client baseline, so --url runs (and runs recording a new baseline)
+        only compare against an explicit one.
+        """
+        if options['no_baseline']:
+            return None
+        path = options['baseline']
+        if path is None and not (options['url'] or options['save_baseline']):
+            path = benchmarks.BASELINE_PATH
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Baseline {path} does not exist. Record one with --save-baseline {path}, '
+                'or pass --no-baseline to skip the regression check.'
+            )
+        except ValueError as e:
+            raise CommandError(f'Baseline {path} is not valid JSON: {e}')
+
+    def run_client(self, options):
+        caches = None if options['cache'] else {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            benchmarks.seed_catalog(
+                products=options['products'],
+                reviews_per_product=options['reviews_per_product'],
+                orders=options['orders'],
+                seed=options['seed'],
+            )
+            self.stderr.write(f'Seeded test database in {time.perf_counter() - started:.1f}s')
+            # Everything reads from the seeded test database, never a replica
+            with override_settings(DATABASE_ROUTERS=[], **({'CACHES': caches} if caches else {})):
+                return benchmarks.run_client_benchmark(
+                    requests=options['requests'],
+                    rounds=options['rounds'],
+                    seed=options['seed'],
+                    only=options['only'],
+                    log=self.stdout.write,
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_http(self, options):
+        rng = random.Random(options['seed'])
+        base_url = options['url'].rstrip('/')
+        results = {}
+        for name, make_request in benchmarks.scenarios(rng):
+            method, path, _ = make_request()
+            if method != 'GET' or (options['only'] and name not in options['only']):
+                continue
+            results[name] = run_load_processes(
+                base_url + path,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                processes=options['processes'],
+            )
+            self.stdout.write(benchmarks.format_row(name, results[name]))
+        return results
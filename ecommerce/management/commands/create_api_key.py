@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ecommerce.apikeys import create_key
+
+
+class Command(BaseCommand):
+    help = 'Issue an API key for a user. The key is printed once and only its hash is stored.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='', help='What the key is for')
+        parser.add_argument('--expires-in-days', type=int, help='Expire the key after this many days')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+        days = options['expires_in_days']
+        expires_at = timezone.now() + timedelta(days=days) if days else None
+        api_key, key = create_key(user, name=options['name'], expires_at=expires_at)
+        self.stderr.write(f'Created API key {api_key.prefix} for {user.username}')
+        self.stdout.write(key)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.loadgen import run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test one or more running endpoints and compare throughput and latency, '
+        'e.g. the WSGI /api/products/ against the ASGI /api/async/products/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50])
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        header = f"{'url':<50} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        self.stdout.write(header)
+        for concurrency in options['concurrency']:
+            for url in options['urls']:
+                result = run_load(
+                    url,
+                    requests=options['requests'],
+                    concurrency=concurrency,
+                    timeout=options['timeout'],
+                )
+                self.stdout.write(
+                    f"{url[-50:]:<50} {concurrency:>5} {result['throughput']:>9.1f} "
+                    f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                    f"{result['errors']:>7}"
+                )
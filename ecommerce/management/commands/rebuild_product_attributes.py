@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce import attributes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the indexed product attribute table from Product.specifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = attributes.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed attributes of {total} products'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from the full order history'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup rows'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the Product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING(
+                'Full-text index is only available on SQLite; searches use icontains.'
+            ))
+            return
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Backfill and reconcile Product rating counters against the Review table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many products are out of date'
+        )
+
+    def handle(self, *args, **options):
+        stale = reconcile_ratings(fix=not options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{stale} products have stale rating counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled {stale} products'))
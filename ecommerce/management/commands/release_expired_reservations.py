@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Return the stock of expired reservations held by pending orders. The '
+        'orders stay pending. Meant to run every minute or so from cron.'
+    )
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released {released} units of expired reservations'))
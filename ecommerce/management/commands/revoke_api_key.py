@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.apikeys import revoke
+from ecommerce.models import APIKey
+
+
+class Command(BaseCommand):
+    help = 'Revoke an API key by its prefix (the part before the dot)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('prefix')
+
+    def handle(self, *args, **options):
+        try:
+            api_key = APIKey.objects.get(prefix=options['prefix'])
+        except APIKey.DoesNotExist:
+            raise CommandError(f"No API key with prefix {options['prefix']!r}")
+        revoke(api_key)
+        self.stdout.write(self.style.SUCCESS(f'Revoked API key {api_key.prefix}'))
@@ -0,0 +1,74 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ecommerce import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (order notifications) '
+        'on a pool of threads. Failed jobs are retried with exponential backoff.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait before checking an empty queue again'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no jobs are due instead of waiting for more'
+        )
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        poll_interval = options['poll_interval']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Worker {worker} running with {threads} threads')
+        in_flight = set()
+        last_stale_check = 0
+        with ThreadPoolExecutor(threads) as pool:
+            while not self.stopping:
+                if time.monotonic() - last_stale_check > 60:
+                    requeued = jobs.requeue_stale()
+                    if requeued:
+                        self.stdout.write(f'Requeued {requeued} stale jobs')
+                    last_stale_check = time.monotonic()
+
+                claimed = jobs.claim(worker, threads - len(in_flight)) if len(in_flight) < threads else []
+                for job in claimed:
+                    in_flight.add(pool.submit(self.run_job, job))
+
+                if not in_flight:
+                    if options['burst']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                done, in_flight = wait(
+                    in_flight, timeout=0 if claimed else poll_interval, return_when=FIRST_COMPLETED
+                )
+            # Let running jobs finish so none is left marked as running
+            wait(in_flight)
+        close_old_connections()
+
+    def run_job(self, job):
+        try:
+            status = jobs.run(job)
+            self.stdout.write(f'{job.task} #{job.id} attempt {job.attempts}: {status}')
+        finally:
+            close_old_connections()
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping after running jobs finish')
+        self.stopping = True
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce.benchmarks import seed_catalog
+from ecommerce.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the configured database with a reproducible synthetic catalog, reviews '
+        'and orders, e.g. to run "benchmark --url" against a server using it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--reviews-per-product', type=int, default=2)
+        parser.add_argument('--orders', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--allow-existing', action='store_true',
+            help='Add to a database that already has products'
+        )
+
+    def handle(self, *args, **options):
+        if Product.objects.exists() and not options['allow_existing']:
+            raise CommandError('The database already has products; pass --allow-existing to add more.')
+        seed_catalog(
+            products=options['products'],
+            reviews_per_product=options['reviews_per_product'],
+            orders=options['orders'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS('Seeded catalog'))
@@ -0,0 +1,120 @@
+"""
+In-process request metrics, rendered in the Prometheus text format at
+/api/metrics/. Each worker process keeps its own histograms, so scrape
+every worker (or run a single worker) to see the whole picture.
+"""
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(pairs):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def histogram(self, name, help_text, buckets):
+        self._metrics[name] = ('histogram', help_text, buckets, {})
+
+    def counter(self, name, help_text):
+        self._metrics[name] = ('counter', help_text, None, {})
+
+    def observe(self, name, labels, value):
+        _, _, buckets, series = self._metrics[name]
+        with self._lock:
+            if labels not in series:
+                series[labels] = Histogram(buckets)
+            series[labels].observe(value)
+
+    def inc(self, name, labels, amount=1):
+        series = self._metrics[name][3]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            for _, _, _, series in self._metrics.values():
+                series.clear()
+
+    def render(self, extra=()):
+        """
+        Render every metric, plus ``extra`` (name, type, help, [(labels,
+        value)]) tuples for values read elsewhere, such as cache counters.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _, series) in self._metrics.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(series.items()):
+                    if kind == 'counter':
+                        lines.append(f'{name}{{{_labels(labels)}}} {_number(value)}')
+                        continue
+                    for bound, count in value.cumulative():
+                        bucket_labels = _labels(labels + (('le', bound),))
+                        lines.append(f'{name}_bucket{{{bucket_labels}}} {count}')
+                    lines.append(f'{name}_sum{{{_labels(labels)}}} {_number(value.sum)}')
+                    lines.append(f'{name}_count{{{_labels(labels)}}} {value.count}')
+        for name, kind, help_text, samples in extra:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{{{_labels(labels)}}} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REGISTRY.counter('shop_requests_total', 'Requests by view, method and status code.')
+REGISTRY.histogram(
+    'shop_request_duration_seconds', 'Total time spent handling the request.', LATENCY_BUCKETS
+)
+REGISTRY.histogram('shop_request_db_queries', 'SQL queries run per request.', QUERY_BUCKETS)
+REGISTRY.histogram('shop_request_db_seconds', 'Time spent in SQL queries per request.', LATENCY_BUCKETS)
+REGISTRY.histogram(
+    'shop_request_render_seconds',
+    'Time spent rendering the response body (JSON serialization or templates).',
+    LATENCY_BUCKETS
+)
+
+
+def record_request(view, method, status_code, duration, queries, db_time, render_time):
+    labels = (('view', view), ('method', method))
+    REGISTRY.inc('shop_requests_total', labels + (('status', status_code),))
+    REGISTRY.observe('shop_request_duration_seconds', labels, duration)
+    REGISTRY.observe('shop_request_db_queries', labels, queries)
+    REGISTRY.observe('shop_request_db_seconds', labels, db_time)
+    if render_time is not None:
+        REGISTRY.observe('shop_request_render_seconds', labels, render_time)
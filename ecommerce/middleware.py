@@ -0,0 +1,195 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import compression, metrics
+
+PROFILE_PARAM = 'profile'
+PROFILE_LINES = 60
+
+
+class QueryTimer:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current_timer = ContextVar('query_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.seconds += time.perf_counter() - started
+        timer.queries += 1
+
+
+def install_query_timer(connection):
+    # Kept first so Django's own execute_wrapper() blocks, which pop the
+    # last wrapper, never remove it
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _timed_execute)
+
+
+@receiver(connection_created)
+def _install_on_connect(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+@contextmanager
+def timing_queries(timer):
+    """
+    Count the queries run in this context into ``timer``. The timer is
+    found through a context variable, so queries the async ORM runs in a
+    worker thread are counted too.
+    """
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the latency, SQL query count, SQL time and response render time
+    of every request into the histograms in metrics.py, labelled by URL
+    name. Staff users can add ``?profile=1`` to get a cProfile report of
+    the request instead of its response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+        if self.wants_profile(request):
+            return self.profile(request)
+        timer, started = QueryTimer(), time.perf_counter()
+        with timing_queries(timer):
+            response = self.get_response(request)
+        self.record(request, response, timer, started)
+        return response
+
+    async def __acall__(self, request):
+        timer, started = QueryTimer(), time.perf_counter()
+        with timing_queries(timer):
+            response = await self.get_response(request)
+        self.record(request, response, timer, started)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before the response is rendered; DRF responses are
+        # serialized to JSON during render
+        request._render_started = time.perf_counter()
+        response.add_post_render_callback(
+            lambda rendered: setattr(request, '_render_time', time.perf_counter() - request._render_started)
+        )
+        return response
+
+    def record(self, request, response, timer, started):
+        match = getattr(request, 'resolver_match', None)
+        metrics.record_request(
+            view=match.view_name if match else 'unmatched',
+            method=request.method,
+            status_code=str(response.status_code),
+            duration=time.perf_counter() - started,
+            queries=timer.queries,
+            db_time=timer.seconds,
+            render_time=getattr(request, '_render_time', None),
+        )
+
+    def wants_profile(self, request):
+        if request.GET.get(PROFILE_PARAM) != '1':
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def profile(self, request):
+        timer, profiler = QueryTimer(), cProfile.Profile()
+        with timing_queries(timer):
+            started = time.perf_counter()
+            profiler.enable()
+            response = self.get_response(request)
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+
+        report = io.StringIO()
+        report.write(
+            f'{request.method} {request.get_full_path()} -> {response.status_code}\n'
+            f'total {elapsed * 1000:.1f} ms, {timer.queries} queries in {timer.seconds * 1000:.1f} ms\n\n'
+        )
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return HttpResponse(report.getvalue(), content_type='text/plain; charset=utf-8')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses (JSON, CSV/NDJSON exports, plain text) with the
+    best encoding the client accepts: brotli when available, else gzip.
+    Bodies under COMPRESSION_MIN_SIZE bytes aren't worth the CPU. Streamed
+    exports are compressed as they stream. HTML is left alone so CSRF
+    tokens in pages aren't exposed to BREACH.
+    """
+
+    def process_response(self, request, response):
+        if not compression.is_compressible_type(response.get('Content-Type')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (
+            response.has_header('Content-Encoding')
+            or response.status_code in (204, 206, 304)
+            or 'no-transform' in response.get('Cache-Control', '')
+        ):
+            return response
+        encoding = compression.choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compression.compress_stream(response.streaming_content, encoding)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compression.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs byte for byte, so only a weak ETag holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
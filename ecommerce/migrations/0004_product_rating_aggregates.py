@@ -0,0 +1,54 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('ecommerce', 'Product')
+    Review = apps.get_model('ecommerce', 'Review')
+    stats = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    Product.objects.update(
+        rating_count=Coalesce(Subquery(stats.annotate(c=Count('id')).values('c')), 0),
+        rating_total=Coalesce(Subquery(stats.annotate(t=Sum('rating')).values('t')), 0),
+    )
+    for product in Product.objects.filter(rating_count__gt=0).only('id', 'rating_count', 'rating_total').iterator():
+        Product.objects.filter(pk=product.pk).update(
+            rating_avg=product.rating_total / product.rating_count
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.CharField(blank=True, choices=[('food', 'Food'), ('arts_crafts', 'Arts'), ('automotive', 'Automotive'), ('baby', 'Baby'), ('beauty', 'Beauty'), ('books', 'Books'), ('computers', 'Computers'), ('electronics', 'Electronics'), ('fashion', 'Men & Women Fashion'), ('health', 'Health'), ('home_kitchen', 'Kitchen'), ('industrial', 'Industrial'), ('kids_fashion', 'Kids Fashion'), ('movies_tv', 'Movies'), ('music', 'Music'), ('office', 'Office'), ('pet_supplies', 'Pet'), ('sports_outdoors', 'Outdoors'), ('tools_home', 'Tools'), ('toys_games', 'Toys'), ('video_games', 'Games'), ('clothing', 'Clothing'), ('home', 'Home'), ('sports', 'Sports'), ('sneakers', 'Sneakers')], max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
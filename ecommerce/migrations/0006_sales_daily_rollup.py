@@ -0,0 +1,58 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Order = apps.get_model('ecommerce', 'Order')
+    OrderItem = apps.get_model('ecommerce', 'OrderItem')
+    SalesDailyRollup = apps.get_model('ecommerce', 'SalesDailyRollup')
+    rows = {}
+    orders = Order.objects.order_by().annotate(day=TruncDate('created_at')).values(
+        'day', 'status'
+    ).annotate(orders=Count('id'), revenue=Sum('total_amount'))
+    for row in orders:
+        rows[(row['day'], row['status'], '__all__')] = [row['orders'], row['revenue'] or 0, 0]
+    items = OrderItem.objects.order_by().annotate(day=TruncDate('order__created_at')).values(
+        'day', 'order__status', category=Coalesce('product__category', Value(''))
+    ).annotate(orders=Count('order', distinct=True), revenue=Sum('price'), units=Sum('quantity'))
+    for row in items:
+        rows[(row['day'], row['order__status'], row['category'])] = [
+            row['orders'], row['revenue'] or 0, row['units'] or 0
+        ]
+        rows.setdefault((row['day'], row['order__status'], '__all__'), [0, 0, 0])[2] += row['units'] or 0
+    SalesDailyRollup.objects.bulk_create([
+        SalesDailyRollup(
+            day=day, status=status, category=category, orders=orders, revenue=revenue, units=units
+        )
+        for (day, status, category), (orders, revenue, units) in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('category', models.CharField(blank=True, max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'day'], name='sales_rollup_category_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'category'), name='sales_rollup_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
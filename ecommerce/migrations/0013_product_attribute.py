@@ -0,0 +1,96 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:45
+
+import json
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of ecommerce.attributes.extract_attributes as of this
+# migration, so later changes to the app code can't change what it does
+MAX_ATTRIBUTES = 100
+NUMBER_RE = re.compile(r'^\s*([-+]?\d+(?:\.\d+)?)')
+
+
+def _normalize_value(value):
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    return str(value).strip().lower()[:255]
+
+
+def _leading_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_RE.match(str(value))
+    return float(match.group(1)) if match else None
+
+
+def _flatten(value, key):
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            yield from _flatten(child, f'{key}.{child_key}' if key else str(child_key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten(item, key)
+    elif value is not None and key:
+        yield key, value
+
+
+def extract_attributes(specifications):
+    if isinstance(specifications, str):
+        try:
+            specifications = json.loads(specifications)
+        except ValueError:
+            return []
+    if not isinstance(specifications, dict):
+        return []
+    attributes = {}
+    for key, value in _flatten(specifications, ''):
+        pair = (str(key).strip().lower()[:100], _normalize_value(value))
+        if pair[0] and pair[1] and pair not in attributes:
+            attributes[pair] = _leading_number(value)
+            if len(attributes) >= MAX_ATTRIBUTES:
+                break
+    return [(key, value, number) for (key, value), number in attributes.items()]
+
+
+def backfill_attributes(apps, schema_editor):
+    Product = apps.get_model('ecommerce', 'Product')
+    ProductAttribute = apps.get_model('ecommerce', 'ProductAttribute')
+    batch = []
+    for product in Product.objects.only('id', 'specifications').iterator(chunk_size=2000):
+        batch.extend(
+            ProductAttribute(product_id=product.pk, key=key, value=value, num_value=number)
+            for key, value, number in extract_attributes(product.specifications)
+        )
+        if len(batch) >= 2000:
+            ProductAttribute.objects.bulk_create(batch)
+            batch = []
+    ProductAttribute.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0012_order_tracking_number_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=255)),
+                ('num_value', models.FloatField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attributes', to='ecommerce.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'value', 'product'], name='attribute_key_value_idx'), models.Index(fields=['key', 'num_value', 'product'], name='attribute_key_number_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'key', 'value'), name='product_attribute_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_attributes, migrations.RunPython.noop),
+    ]
@@ -39,6 +39,10 @@ class Product(models.Model):
     stock_count = models.IntegerField(default=0)
     specifications = models.JSONField(default=dict, null=True, blank=True)
     images = models.JSONField(default=list, null=True, blank=True)
+    # Review aggregates, maintained by the Review signals in signals.py
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -51,6 +55,49 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Listing order and keyset pagination on each ordering field
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['rating_avg', 'id'], name='product_rating_idx'),
+            # Incremental exports
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+            # Category browsing, alone or with a price range
+            models.Index(fields=['category', 'created_at'], name='product_category_created_idx'),
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(stock_count=0),
+                name='product_out_of_stock_idx'
+            ),
+        ]
+
+class ProductAttribute(models.Model):
+    """
+    One key/value pair of ``Product.specifications``, flattened so spec
+    filters use an index instead of scanning the JSON. Maintained from
+    Product saves, imports and ``manage.py rebuild_product_attributes``;
+    see attributes.py.
+    """
+    product = models.ForeignKey(Product, related_name='attributes', on_delete=models.CASCADE)
+    key = models.CharField(max_length=100)
+    value = models.CharField(max_length=255)
+    # Leading number of the value ("16GB" -> 16) for range filters
+    num_value = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'key', 'value'], name='product_attribute_unique'),
+        ]
+        indexes = [
+            # Both cover the product id the filters select
+            models.Index(fields=['key', 'value', 'product'], name='attribute_key_value_idx'),
+            models.Index(fields=['key', 'num_value', 'product'], name='attribute_key_number_idx'),
+        ]
 
 class Review(models.Model):
     product = models.ForeignKey(Product, related_name='reviews', on_delete=models.CASCADE)
@@ -64,6 +111,11 @@ class Review(models.Model):
     def __str__(self):
         return f"Review for {self.product.name} by {self.user.username}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date', 'id'], name='review_product_date_idx'),
+        ]
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -96,6 +148,16 @@ class Order(models.Model):
     def __str__(self):
         return f"Order {self.id} by {self.user.username if self.user else 'Unknown'}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Support looks orders up by tracking number in the admin
+            models.Index(fields=['tracking_number'], name='order_tracking_number_idx'),
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(
         Order, 
@@ -125,3 +187,143 @@ class OrderItem(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+class StockReservation(models.Model):
+    """
+    Stock taken by an order line. Held reservations are committed when the
+    order is confirmed, and released back to ``Product.stock_count`` when it
+    is cancelled or the reservation passes ``expires_at``. See stock.py.
+    """
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quantity}x product {self.product_id} for order {self.order_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_expiry_idx'),
+        ]
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a request sent with an ``Idempotency-Key`` header,
+    replayed when the same key is sent again before ``expires_at``. See
+    idempotency.py.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+class Job(models.Model):
+    """
+    A unit of background work run by ``manage.py runworker``. See jobs.py.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Due jobs are claimed in run_at order
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['locked_by'], name='job_locked_by_idx'),
+        ]
+
+class APIKey(models.Model):
+    """
+    A credential for the API, sent as ``Authorization: Api-Key <key>``. Only
+    a SHA-256 hash of the key is stored; ``prefix`` is the indexed public
+    part used to find the row. See apikeys.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(max_length=100, blank=True)
+    prefix = models.CharField(max_length=16, unique=True)
+    key_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.prefix} ({self.user})"
+
+    class Meta:
+        verbose_name = 'API key'
+
+class SalesDailyRollup(models.Model):
+    """
+    Per-day sales totals by order status and product category, maintained
+    incrementally as orders are placed and change status. Rows with
+    ``category == ALL_CATEGORIES`` hold whole-order totals; the other rows
+    hold the share of each order's lines in that category.
+    """
+    ALL_CATEGORIES = '__all__'
+
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    category = models.CharField(max_length=20, blank=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.status} {self.category or 'uncategorized'}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'category'],
+                name='sales_rollup_bucket_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'day'], name='sales_rollup_category_day_idx'),
+        ]
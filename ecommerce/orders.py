@@ -0,0 +1,88 @@
+from django.db import transaction
+
+from .models import Product, Order, OrderItem
+from . import jobs, rollups, stock
+from . import cache as catalog_cache
+from .tasks import send_order_notification
+
+
+class OrderPlacementError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def normalize_items(products_data):
+    """
+    Collapse the ``products`` payload into ``{product_id: quantity}``,
+    merging repeated product ids, in the order they were first given.
+    """
+    lines = {}
+    for item in products_data:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            raise OrderPlacementError('Each product needs an integer product_id and quantity')
+        if quantity < 1:
+            raise OrderPlacementError(f'Quantity for product {product_id} must be at least 1')
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    return lines
+
+
+def place_order(user, products_data, shipping_address=None):
+    """
+    Create an order and its items in one transaction with a fixed number of
+    queries: one product fetch, one stock UPDATE, one order INSERT, one bulk
+    INSERT each for the items and the stock reservations, one job INSERT,
+    plus one rollup UPDATE per category and two for the whole order. Notifications are sent later by
+    the job worker.
+    """
+    lines = normalize_items(products_data)
+    if not lines:
+        raise OrderPlacementError('At least one product is required')
+
+    with transaction.atomic():
+        products = Product.objects.only(
+            'id', 'name', 'price', 'category', 'stock_count'
+        ).order_by().in_bulk(list(lines))
+
+        for product_id, quantity in lines.items():
+            product = products.get(product_id)
+            if product is None:
+                raise OrderPlacementError(f'Product {product_id} not found', status_code=404)
+            if product.stock_count < quantity:
+                raise OrderPlacementError(stock.insufficient_stock(product).message)
+
+        try:
+            stock.decrement_stock(lines)
+        except stock.StockUnavailable as e:
+            raise OrderPlacementError(e.message)
+
+        items = []
+        total_amount = 0
+        for product_id, quantity in lines.items():
+            price = products[product_id].price * quantity
+            total_amount += price
+            items.append(OrderItem(product_id=product_id, quantity=quantity, price=price))
+
+        order = Order.objects.create(
+            user=user,
+            shipping_address=shipping_address,
+            total_amount=total_amount
+        )
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        stock.reserve(order, lines)
+
+        # The order itself was counted by the Order post_save signal, but
+        # bulk_create() doesn't send the OrderItem ones
+        categories = {product_id: products[product_id].category for product_id in lines}
+        rollups.record_items(order, items, categories)
+        # Stock levels are part of the cached catalog responses
+        catalog_cache.invalidate_products(products.values())
+        jobs.enqueue(send_order_notification, order_id=order.id, event='placed')
+
+    return order
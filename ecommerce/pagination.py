@@ -0,0 +1,254 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset, cap=1000):
+    """
+    Return ``(count, is_estimate)`` without paying for an exact COUNT(*)
+    over a large table. PostgreSQL answers from the planner's row estimate;
+    other backends count at most ``cap + 1`` rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A Paginator for the admin changelists that counts at most
+    ``estimate_cap`` rows (or asks the PostgreSQL planner) instead of
+    running an exact COUNT(*) over the whole table. Past the cap the page
+    links stop at the estimate.
+    """
+    estimate_cap = 10_000
+
+    @cached_property
+    def count(self):
+        count, is_estimate = estimate_count(self.object_list, self.estimate_cap)
+        if is_estimate and count < self.estimate_cap:
+            # Planner estimates for small results can be far off, and counting them is cheap
+            return self.object_list.count()
+        return count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on ``(ordering field, id)``.
+
+    Each page is fetched with ``WHERE (field, id) < (last field, last id)``
+    instead of an OFFSET, so the cost of a page does not depend on how deep
+    it is. Cursors are opaque base64 tokens. The total count is skipped by
+    default; ``?count=exact`` or ``?count=estimate`` add it back.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    count_query_param = 'count'
+    count_modes = ('none', 'exact', 'estimate')
+    default_count_mode = 'none'
+    estimate_cap = 1000
+    default_ordering = '-created_at'
+    tiebreak_field = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        self.ordering_override = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request, view)
+        cursor = self.decode_cursor(request, queryset.model)
+
+        self.count = None
+        self.count_is_estimate = False
+        count_mode = request.query_params.get(self.count_query_param, self.default_count_mode)
+        if count_mode not in self.count_modes:
+            count_mode = self.default_count_mode
+        if count_mode == 'exact':
+            self.count = queryset.order_by().count()
+        elif count_mode == 'estimate':
+            self.count, self.count_is_estimate = estimate_count(queryset, self.estimate_cap)
+
+        reverse = bool(cursor and cursor.get('r'))
+        # Walking backwards flips both the comparison and the sort order
+        descending = self.descending != reverse
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor, descending))
+
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + self.field, prefix + self.tiebreak_field)
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+            if self.count_is_estimate:
+                payload['count_is_estimate'] = True
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, view):
+        allowed = set(getattr(view, 'ordering_fields', None) or [])
+        default = self.ordering_override or self.default_ordering
+        view_ordering = getattr(view, 'ordering', None)
+        if not self.ordering_override and view_ordering:
+            default = view_ordering[0] if isinstance(view_ordering, (list, tuple)) else view_ordering
+
+        ordering = default
+        if not self.ordering_override:
+            requested = request.query_params.get(self.ordering_query_param, '').split(',')[0].strip()
+            if requested and requested.lstrip('-') in allowed:
+                ordering = requested
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def seek_filter(self, cursor, descending):
+        lookup = 'lt' if descending else 'gt'
+        value = cursor['v']
+        pk = cursor['id']
+        return (
+            Q(**{f'{self.field}__{lookup}': value}) |
+            Q(**{self.field: value, f'{self.tiebreak_field}__{lookup}': pk})
+        )
+
+    def decode_cursor(self, request, model):
+        """
+        Decode the cursor token, converting its values through the model
+        fields so a tampered token is a 404 rather than a database error.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(cursor, dict) or cursor.get('f') != self.field:
+                raise ValueError
+            if not all(isinstance(cursor.get(key), (int, float, str)) for key in ('v', 'id')):
+                raise ValueError
+            cursor['v'] = self._to_python(model, self.field, cursor['v'])
+            cursor['id'] = self._to_python(model, self.tiebreak_field, cursor['id'])
+        except (TypeError, ValueError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    @staticmethod
+    def _to_python(model, field_name, value):
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return value
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError
+        return value
+
+    def encode_cursor(self, row, reverse=False):
+        value = self._row_value(row, self.field)
+        if value is not None and not isinstance(value, (int, float, str, bool)):
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        cursor = {'f': self.field, 'v': value, 'id': self._row_value(row, self.tiebreak_field)}
+        if reverse:
+            cursor['r'] = 1
+        token = base64.urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    @staticmethod
+    def _row_value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+
+class KeysetOptInMixin:
+    """
+    Switch a viewset to ``KeysetPagination`` when the request carries a
+    ``cursor`` parameter (``?cursor=`` starts at the first page), leaving the
+    regular page-number pagination in place otherwise.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            cursor_param = self.keyset_pagination_class.cursor_query_param
+            if request is not None and cursor_param in request.query_params:
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,61 @@
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
+
+from .models import Product, Review
+
+
+def apply_rating_change(product_id, count_delta, total_delta):
+    """
+    Shift a product's rating counters by the given deltas in one UPDATE.
+    The average is recomputed in SQL from the new count and total, so
+    concurrent review writes can't overwrite each other.
+    """
+    if product_id is None or (not count_delta and not total_delta):
+        return
+    count = F('rating_count') + count_delta
+    total = F('rating_total') + total_delta
+    Product.objects.filter(pk=product_id).update(
+        updated_at=Now(),
+        rating_count=count,
+        rating_total=total,
+        rating_avg=Case(
+            When(Q(rating_count__gt=-count_delta), then=Cast(total, FloatField()) / count),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+    )
+
+
+def reconcile_ratings(fix=True):
+    """
+    Compare every product's stored counters with its reviews and, when
+    ``fix`` is true, rewrite the stale ones. Returns the number of
+    products whose counters were out of date.
+    """
+    stats = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    actual_count = Coalesce(Subquery(stats.annotate(c=Count('id')).values('c')), 0)
+    actual_total = Coalesce(Subquery(stats.annotate(t=Sum('rating')).values('t')), 0)
+
+    stale = list(Product.objects.annotate(
+        actual_count=actual_count,
+        actual_total=actual_total
+    ).exclude(
+        rating_count=F('actual_count'),
+        rating_total=F('actual_total')
+    ).values_list('pk', flat=True))
+
+    if fix and stale:
+        # Only the stale rows, so exports don't see every product as changed
+        Product.objects.filter(pk__in=stale).update(
+            rating_count=actual_count,
+            rating_total=actual_total,
+            updated_at=Now(),
+        )
+        Product.objects.filter(pk__in=stale).update(
+            rating_avg=Case(
+                When(rating_count__gt=0, then=Cast(F('rating_total'), FloatField()) / F('rating_count')),
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        )
+    return len(stale)
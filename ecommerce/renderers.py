@@ -0,0 +1,70 @@
+"""
+JSON renderer and parser backed by orjson, producing the same bytes as
+DRF's JSONRenderer for everything the API returns.
+
+orjson is only used for the compact, UTF-8 output the API sends by default.
+Anything it can't reproduce exactly falls back to the stdlib path of the
+DRF classes: indented output (the browsable API, ``; indent=4``), the
+ASCII-only or non-compact settings, integers over 64 bits, lone surrogates,
+and installs without orjson. Datetimes, Decimals and every other type json
+can't encode natively go through DRF's own ``JSONEncoder.default``, so
+their formats are unchanged.
+
+Known differences, both still valid JSON: orjson writes large and small
+floats without the ``+`` and leading zero in the exponent (``1e16`` rather
+than ``1e+16``), and writes NaN and infinity as ``null`` where the stdlib
+path raises an error.
+"""
+import io
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson is not None else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def can_use_orjson(self, indent):
+        return orjson is not None and indent is None and self.compact and not self.ensure_ascii
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not self.can_use_orjson(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Let the stdlib path produce the result or the original error
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # orjson rejects some documents json accepts, such as integers
+            # over 64 bits; reparse to get json's result or its error message
+            pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
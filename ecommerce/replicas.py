@@ -0,0 +1,76 @@
+"""
+Read replica routing.
+
+Reads of the catalog and the sales rollups go to the primary unless they
+run inside ``use_replica()``, which the catalog GET endpoints and the
+dashboard do. Everything else, including every read made while placing an
+order or importing products and every API key lookup, stays on the
+primary, so code that writes and reads back never sees replication lag.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Models whose reads may lag; authentication, orders, stock reservations
+# and jobs must see their latest writes
+REPLICA_MODELS = {
+    'ecommerce.product', 'ecommerce.productattribute', 'ecommerce.review', 'ecommerce.salesdailyrollup',
+}
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def _location(alias):
+    settings_dict = connections[alias].settings_dict
+    return settings_dict['HOST'], settings_dict['PORT'], str(settings_dict['NAME'])
+
+
+def replica_configured():
+    """
+    Whether a replica alias exists and points at a different database than
+    the primary. A test mirror shares the primary's database, so reads
+    stay on the primary connection where the test's data is visible.
+    """
+    if REPLICA_ALIAS not in connections.settings:
+        return False
+    return _location(REPLICA_ALIAS) != _location(DEFAULT_DB_ALIAS)
+
+
+@contextmanager
+def use_replica():
+    """Send reads in this block (or decorated function) to the replica, if one is configured."""
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Sessions, auth, API keys and the cache table stay on the primary
+        if model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if _reading_from_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data, so objects from either may be related
+        return True
+
+
+class ReplicaReadMixin:
+    """Serve a view's safe-method requests from the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with use_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
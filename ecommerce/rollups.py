@@ -0,0 +1,184 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, SalesDailyRollup
+
+ALL = SalesDailyRollup.ALL_CATEGORIES
+
+
+def _day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _total(value):
+    # Totals assigned as strings or floats stay that way on the instance
+    return Order._meta.get_field('total_amount').to_python(value) or 0
+
+
+def _item_category():
+    # Products without a category and deleted products share the '' bucket
+    return Coalesce('product__category', Value(''))
+
+
+def _bump(day, status, category, orders, revenue, units):
+    filters = {'day': day, 'status': status, 'category': category}
+    changes = {
+        'orders': F('orders') + orders,
+        'revenue': F('revenue') + revenue,
+        'units': F('units') + units,
+    }
+    if SalesDailyRollup.objects.filter(**filters).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SalesDailyRollup.objects.create(orders=orders, revenue=revenue, units=units, **filters)
+    except IntegrityError:
+        # Another writer created the bucket first
+        SalesDailyRollup.objects.filter(**filters).update(**changes)
+
+
+def _apply(day, status, breakdown, sign):
+    for category, (orders, revenue, units) in breakdown.items():
+        _bump(day, status, category, sign * orders, sign * revenue, sign * units)
+
+
+def breakdown_from_items(items, categories):
+    """
+    Build ``{category: (orders, revenue, units)}`` for one order from its
+    items and a ``{product_id: category}`` map, including the whole-order
+    ``ALL`` bucket.
+    """
+    revenue = defaultdict(Decimal)
+    units = defaultdict(int)
+    for item in items:
+        category = categories.get(item.product_id) or ''
+        revenue[category] += item.price or 0
+        units[category] += item.quantity
+    breakdown = {
+        category: (1, revenue[category], units[category]) for category in revenue
+    }
+    breakdown[ALL] = (1, sum(revenue.values(), Decimal(0)), sum(units.values()))
+    return breakdown
+
+
+def item_breakdown(order_id):
+    """``{category: (1, revenue, units)}`` for the items an order has now."""
+    rows = OrderItem.objects.filter(order_id=order_id).order_by().values(
+        category=_item_category()
+    ).annotate(revenue=Sum('price'), units=Sum('quantity'))
+    return {row['category']: (1, row['revenue'] or 0, row['units'] or 0) for row in rows}
+
+
+def order_breakdown(order):
+    breakdown = item_breakdown(order.pk)
+    # Whole-order revenue is the order total, as in rebuild_rollups()
+    breakdown[ALL] = (1, _total(order.total_amount), sum(value[2] for value in breakdown.values()))
+    return breakdown
+
+
+def record_order(order, breakdown=None):
+    """
+    Count a newly created order. Without a ``breakdown`` only the
+    whole-order bucket is bumped: its items are added as they are saved,
+    or by record_items() when they are bulk-created.
+    """
+    if breakdown is None:
+        breakdown = {ALL: (1, _total(order.total_amount), 0)}
+    _apply(_day(order), order.status, breakdown, 1)
+
+
+def record_items(order, items, categories):
+    """
+    Add the bulk-created ``items`` of an order that had no items before,
+    which bulk_create() doesn't report through the OrderItem signals.
+    """
+    breakdown = breakdown_from_items(items, categories)
+    breakdown[ALL] = (0, 0, breakdown[ALL][2])
+    _apply(_day(order), order.status, breakdown, 1)
+
+
+def apply_item_changes(order_id, before):
+    """
+    Move an order's buckets from its ``before`` item_breakdown() to what
+    its items add up to now, after items were saved or deleted.
+    """
+    order = Order.objects.only('status', 'created_at').filter(pk=order_id).first()
+    if order is None:
+        return
+    after = item_breakdown(order_id)
+    changes = {}
+    for category in before.keys() | after.keys():
+        old, new = before.get(category, (0, 0, 0)), after.get(category, (0, 0, 0))
+        delta = tuple(new_value - old_value for new_value, old_value in zip(new, old))
+        if any(delta):
+            changes[category] = delta
+    units = sum(delta[2] for delta in changes.values())
+    if units:
+        changes[ALL] = (0, 0, units)
+    _apply(_day(order), order.status, changes, 1)
+
+
+def change_order_total(order, status, old_total):
+    delta = _total(order.total_amount) - _total(old_total)
+    if delta:
+        _bump(_day(order), status, ALL, 0, delta, 0)
+
+
+def move_order_status(order, old_status, new_status):
+    breakdown = order_breakdown(order)
+    day = _day(order)
+    _apply(day, old_status, breakdown, -1)
+    _apply(day, new_status, breakdown, 1)
+
+
+def remove_order(order):
+    _apply(_day(order), order.status, order_breakdown(order), -1)
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the Order and OrderItem tables."""
+    rows = {}
+
+    orders = Order.objects.order_by().annotate(day=TruncDate('created_at')).values(
+        'day', 'status'
+    ).annotate(orders=Count('id'), revenue=Sum('total_amount'))
+    for row in orders:
+        rows[(row['day'], row['status'], ALL)] = [row['orders'], row['revenue'] or 0, 0]
+
+    items = OrderItem.objects.order_by().annotate(day=TruncDate('order__created_at')).values(
+        'day', 'order__status', category=_item_category()
+    ).annotate(
+        orders=Count('order', distinct=True),
+        revenue=Sum('price'),
+        units=Sum('quantity')
+    )
+    for row in items:
+        key = (row['day'], row['order__status'], row['category'])
+        rows[key] = [row['orders'], row['revenue'] or 0, row['units'] or 0]
+        rows.setdefault((row['day'], row['order__status'], ALL), [0, 0, 0])[2] += row['units'] or 0
+
+    with transaction.atomic():
+        SalesDailyRollup.objects.all().delete()
+        SalesDailyRollup.objects.bulk_create([
+            SalesDailyRollup(
+                day=day, status=status, category=category,
+                orders=orders, revenue=revenue, units=units
+            )
+            for (day, status, category), (orders, revenue, units) in rows.items()
+        ], batch_size=1000)
+    return len(rows)
+
+
+def sales_totals(days=None):
+    """Order count and revenue across all statuses, optionally for the last ``days`` days."""
+    queryset = SalesDailyRollup.objects.filter(category=ALL)
+    if days is not None:
+        queryset = queryset.filter(day__gte=timezone.localdate() - timedelta(days=days - 1))
+    totals = queryset.aggregate(orders=Sum('orders'), revenue=Sum('revenue'))
+    return totals['orders'] or 0, totals['revenue'] or 0
@@ -0,0 +1,165 @@
+import json
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+# SQLite FTS5 index over the searchable Product columns. The rowid of each
+# index row is the product id, so matches join straight back to the product
+# table. Other database backends fall back to the icontains scan.
+FTS_TABLE = 'ecommerce_product_fts'
+
+# bm25() weights for name, description, category and specifications
+RANK_WEIGHTS = (10.0, 2.0, 5.0, 1.0)
+
+CATEGORY_LABELS = dict(Product.CATEGORY_CHOICES)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _connection(for_write=False):
+    if for_write:
+        alias = router.db_for_write(Product)
+    else:
+        alias = router.db_for_read(Product)
+    return connections[alias]
+
+
+def is_supported(connection=None):
+    connection = connection or _connection()
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression. Every token has to match
+    and the last one is a prefix match so partially typed words still hit.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    terms = ['"%s"' % token for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _document(product):
+    category = product.category or ''
+    specifications = product.specifications
+    if specifications and not isinstance(specifications, str):
+        specifications = json.dumps(specifications)
+    return (
+        product.name or '',
+        product.description or '',
+        f"{category} {CATEGORY_LABELS.get(category, '')}".strip(),
+        specifications or '',
+    )
+
+
+def index_products(products):
+    connection = _connection(for_write=True)
+    if not is_supported(connection):
+        return
+    rows = [(product.pk,) + _document(product) for product in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, category, specifications) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+
+
+def index_product(product):
+    index_products([product])
+
+
+def remove_product(product_id):
+    connection = _connection(for_write=True)
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_index(batch_size=2000):
+    """Drop every index row and re-index the whole catalog in batches."""
+    connection = _connection(for_write=True)
+    if not is_supported(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    total = 0
+    batch = []
+    queryset = Product.objects.only(
+        'id', 'name', 'description', 'category', 'specifications'
+    ).order_by('pk')
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            total += len(batch)
+            batch = []
+    index_products(batch)
+    total += len(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def search_products(queryset, query):
+    """
+    Restrict ``queryset`` to products matching ``query`` and annotate each
+    row with ``search_rank`` (lower is more relevant). The result is ordered
+    by relevance; callers can still apply their own ordering on top.
+    """
+    if not is_supported(connections[queryset.db]):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__icontains=query) |
+            Q(specifications__icontains=query)
+        )
+
+    expression = build_match_expression(query)
+    if not expression:
+        return queryset
+
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return queryset.extra(
+        select={'search_rank': f'bm25({FTS_TABLE}, {weights})'},
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = {Product._meta.db_table}.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).order_by('search_rank', '-created_at')
+
+
+def matching_products(field, query, using=None):
+    """
+    A Q object restricting ``field`` (a Product foreign key, or ``pk`` on
+    Product itself) to products matching ``query``. Unlike
+    search_products() it works inside subqueries and joins, e.g. for
+    filtering order items by product.
+    """
+    connection = connections[using] if using else _connection()
+    if not is_supported(connection):
+        return Q(**{f'{field}__in': search_products(Product.objects.all(), query).values('pk')})
+    expression = build_match_expression(query)
+    if not expression:
+        return Q()
+    return Q(**{f'{field}__in': RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]
+    )})
@@ -1,10 +1,53 @@
+from functools import lru_cache
+
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from rest_framework import serializers
 from .models import Product, Order, OrderItem, Review
 
+
+@lru_cache(maxsize=None)
+def _representation_field(serializer_class, field_name):
+    # A bound field instance, reused so the fast paths format values with
+    # exactly the same rules as the regular serializer
+    return serializer_class().fields[field_name]
+
+
 class ProductSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'category', 'thumbnail', 'in_stock', 'stock_count']
+        fields = ['id', 'name', 'price', 'category', 'thumbnail', 'in_stock', 'stock_count',
+                  'rating_avg', 'rating_count']
+        read_only_fields = ['rating_avg', 'rating_count']
+
+    # Fast path for listings: rows are read with .values() and in_stock is
+    # computed in SQL, skipping model instantiation and per-field dispatch.
+    # The output matches to_representation() exactly.
+    VALUES_FIELDS = ['id', 'name', 'price', 'category', 'thumbnail', 'stock_count',
+                     'rating_avg', 'rating_count', 'created_at']
+
+    @classmethod
+    def values_queryset(cls, queryset):
+        return queryset.annotate(
+            in_stock=ExpressionWrapper(Q(stock_count__gt=0), output_field=BooleanField())
+        ).values(*cls.VALUES_FIELDS, 'in_stock')
+
+    @classmethod
+    def fast_data(cls, rows):
+        price = _representation_field(cls, 'price')
+        return [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'price': None if row['price'] is None else price.to_representation(row['price']),
+                'category': row['category'],
+                'thumbnail': row['thumbnail'],
+                'in_stock': bool(row['in_stock']),
+                'stock_count': row['stock_count'],
+                'rating_avg': float(row['rating_avg']),
+                'rating_count': row['rating_count'],
+            }
+            for row in rows
+        ]
 
 class ReviewSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
@@ -14,19 +57,34 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['user', 'rating', 'comment', 'date']
 
 class ProductDetailSerializer(serializers.ModelSerializer):
-    reviews = ReviewSerializer(many=True, read_only=True)
+    # Only the newest reviews are embedded; the rest are paged through
+    # /api/products/{id}/reviews/
+    REVIEW_PREVIEW_SIZE = 5
+
+    reviews = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'price', 'category', 
-                 'specifications', 'images', 'stock_count', 'rating', 'reviews']
+                 'specifications', 'images', 'stock_count', 'rating', 'rating_count', 'reviews']
+        read_only_fields = ['rating_count']
     
     def get_rating(self, obj):
-        reviews = obj.reviews.all()
-        if not reviews:
-            return 0
-        return sum(review.rating for review in reviews) / len(reviews)
+        return obj.rating_avg
+
+    @classmethod
+    def preview_reviews(cls, product_id):
+        return Review.objects.filter(product_id=product_id).select_related('user').order_by(
+            '-date', '-id'
+        )[:cls.REVIEW_PREVIEW_SIZE]
+
+    def get_reviews(self, obj):
+        # Callers that already loaded the preview (the async views) pass it in
+        reviews = self.context.get('preview_reviews')
+        if reviews is None:
+            reviews = self.preview_reviews(obj.pk)
+        return ReviewSerializer(reviews, many=True).data
 
 class OrderItemSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source='product.name', read_only=True)
@@ -35,6 +93,24 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['product_id', 'name', 'quantity', 'price']
 
+    @classmethod
+    def fast_data(cls, items):
+        """
+        Same output as ``OrderItemSerializer(items, many=True).data`` for
+        items loaded with their product, without per-field dispatch.
+        """
+        price = _representation_field(cls, 'price')
+        data = []
+        for item in items:
+            row = {'product_id': item.product_id}
+            # The regular serializer drops 'name' when the product is gone
+            if item.product is not None:
+                row['name'] = item.product.name
+            row['quantity'] = item.quantity
+            row['price'] = None if item.price is None else price.to_representation(item.price)
+            data.append(row)
+        return data
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     products = serializers.ListField(child=serializers.DictField())
     
@@ -43,6 +119,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         fields = ['products']
 
 class OrderStatusSerializer(serializers.ModelSerializer):
+    order_id = serializers.IntegerField(source='id', read_only=True)
     tracking_info = serializers.SerializerMethodField()
     order_details = serializers.SerializerMethodField()
     
@@ -61,7 +138,7 @@ class OrderStatusSerializer(serializers.ModelSerializer):
     
     def get_order_details(self, obj):
         return {
-            'products': OrderItemSerializer(obj.items.all(), many=True).data,
+            'products': OrderItemSerializer.fast_data(obj.items.all()),
             'total_amount': obj.total_amount,
             'shipping_address': obj.shipping_address,
             'order_date': obj.created_at
@@ -0,0 +1,179 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Product, Review, Order, OrderItem, APIKey
+from . import apikeys, attributes, jobs, search, rollups, stock
+from . import cache as catalog_cache
+from .ratings import apply_rating_change
+from .tasks import send_order_notification
+
+
+@receiver(post_init, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    instance._category_snapshot = instance.__dict__.get('category')
+
+
+def _invalidate_product(product):
+    catalog_cache.invalidate(
+        catalog_cache.ALL_SCOPE,
+        catalog_cache.product_scope(product.pk),
+        catalog_cache.category_scope(product.category),
+        catalog_cache.category_scope(product._category_snapshot),
+    )
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_product(instance)
+    attributes.index_product(instance)
+    _invalidate_product(instance)
+    instance._category_snapshot = instance.category
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+    _invalidate_product(instance)
+
+
+def _invalidate_reviewed_product(product_id):
+    # Ratings show up in listings too, so the product's category goes stale
+    category = Product.objects.filter(pk=product_id).values_list('category', flat=True).first()
+    catalog_cache.invalidate(
+        catalog_cache.ALL_SCOPE,
+        catalog_cache.product_scope(product_id),
+        catalog_cache.category_scope(category),
+    )
+
+
+def _rating_snapshot(review):
+    # Read from __dict__ so deferred fields don't trigger a query
+    return review.__dict__.get('product_id'), review.__dict__.get('rating')
+
+
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._rating_snapshot = _rating_snapshot(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        apply_rating_change(instance.product_id, 1, instance.rating)
+    else:
+        old_product_id, old_rating = instance._rating_snapshot
+        if old_product_id == instance.product_id:
+            apply_rating_change(instance.product_id, 0, instance.rating - (old_rating or 0))
+        else:
+            apply_rating_change(old_product_id, -1, -(old_rating or 0))
+            apply_rating_change(instance.product_id, 1, instance.rating)
+            _invalidate_reviewed_product(old_product_id)
+    _invalidate_reviewed_product(instance.product_id)
+    instance._rating_snapshot = _rating_snapshot(instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, origin=None, **kwargs):
+    # Reviews cascading from a product delete have nothing left to update
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return
+    product_id, rating = instance._rating_snapshot
+    apply_rating_change(product_id, -1, -(rating or 0))
+    _invalidate_reviewed_product(product_id)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._status_snapshot = instance.__dict__.get('status')
+    instance._total_snapshot = instance.__dict__.get('total_amount')
+
+
+@receiver(post_save, sender=Order)
+def apply_order_status_change(sender, instance, created, raw=False, **kwargs):
+    old_status, old_total = instance._status_snapshot, instance._total_snapshot
+    instance._status_snapshot = instance.status
+    instance._total_snapshot = instance.total_amount
+    if created:
+        # Fixtures may load an order's items before the order itself
+        rollups.record_order(instance, rollups.order_breakdown(instance) if raw else None)
+        return
+    if raw or old_status is None:
+        return
+    if old_total != instance.total_amount:
+        rollups.change_order_total(instance, old_status, old_total)
+    if old_status == instance.status:
+        return
+    rollups.move_order_status(instance, old_status, instance.status)
+    stock.order_status_changed(instance, old_status, instance.status)
+    jobs.enqueue(send_order_notification, order_id=instance.pk, event=instance.status)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_rollups_on_delete(sender, instance, **kwargs):
+    rollups.remove_order(instance)
+    # Reservations cascade with the order, so return what it still holds first
+    stock.release_order(instance)
+
+
+def _cascades_from_order(origin):
+    return isinstance(origin, Order) or getattr(origin, 'model', None) is Order
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_order(sender, instance, **kwargs):
+    instance._order_snapshot = instance.__dict__.get('order_id')
+
+
+@receiver(pre_save, sender=OrderItem)
+def snapshot_rollups_before_item_save(sender, instance, **kwargs):
+    order_ids = {instance._order_snapshot, instance.order_id} - {None}
+    instance._rollup_snapshots = {order_id: rollups.item_breakdown(order_id) for order_id in order_ids}
+
+
+@receiver(post_save, sender=OrderItem)
+def update_rollups_on_item_save(sender, instance, **kwargs):
+    # Bulk-created items are recorded by whoever creates them, see place_order()
+    for order_id, before in instance._rollup_snapshots.items():
+        rollups.apply_item_changes(order_id, before)
+    instance._order_snapshot = instance.order_id
+
+
+@receiver(pre_delete, sender=OrderItem)
+def snapshot_rollups_before_item_delete(sender, instance, origin=None, **kwargs):
+    # Deleted orders already took their items out of the rollups
+    if _cascades_from_order(origin):
+        return
+    origin = instance if origin is None else origin
+    # A queryset delete sends every pre_delete before any post_delete, so
+    # the snapshot is kept per order on the origin and applied only once
+    snapshots = origin.__dict__.setdefault('_rollup_delete_snapshots', {})
+    if instance.order_id not in snapshots:
+        snapshots[instance.order_id] = rollups.item_breakdown(instance.order_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_rollups_on_item_delete(sender, instance, origin=None, **kwargs):
+    if _cascades_from_order(origin):
+        return
+    origin = instance if origin is None else origin
+    before = origin.__dict__.get('_rollup_delete_snapshots', {}).pop(instance.order_id, None)
+    if before is not None:
+        rollups.apply_item_changes(instance.order_id, before)
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def forget_changed_api_key(sender, instance, **kwargs):
+    apikeys.forget(prefix=instance.prefix)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_api_keys(sender, instance, **kwargs):
+    # Deactivated users must stop authenticating right away
+    apikeys.forget(user_id=instance.pk)
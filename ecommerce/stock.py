@@ -0,0 +1,142 @@
+"""
+Stock reservations.
+
+Placing an order takes its stock straight away with a conditional UPDATE,
+and records one held ``StockReservation`` per line. A held reservation is
+committed when the order is confirmed, or released (its stock given back)
+when the order is cancelled or deleted, or once the reservation expires.
+Expiry only gives up the hold: the order stays pending, since nothing in
+the shop confirms payment yet.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Product, StockReservation
+from . import cache as catalog_cache
+
+COMMITTED_STATUSES = ('confirmed', 'shipped', 'delivered')
+
+
+class StockUnavailable(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def insufficient_stock(product):
+    return StockUnavailable(
+        f'Insufficient stock for product {product.name}. '
+        f'Available: {product.stock_count}'
+    )
+
+
+def _quantity_case(lines):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in lines.items()],
+        output_field=IntegerField()
+    )
+
+
+def decrement_stock(lines):
+    """
+    Take stock for every line in a single conditional UPDATE. Rows only
+    change when ``stock_count >= quantity``, so if fewer rows than lines
+    were updated another checkout got there first and the caller's
+    transaction must be rolled back.
+    """
+    quantity = _quantity_case(lines)
+    updated = Product.objects.filter(
+        pk__in=list(lines), stock_count__gte=quantity
+    ).update(stock_count=F('stock_count') - quantity, updated_at=Now())
+    if updated == len(lines):
+        return
+    current = Product.objects.only('id', 'name', 'stock_count').order_by().in_bulk(list(lines))
+    for product_id, wanted in lines.items():
+        product = current.get(product_id)
+        if product is not None and product.stock_count < wanted:
+            raise insufficient_stock(product)
+    raise StockUnavailable('Stock changed while placing the order, please retry')
+
+
+def increment_stock(lines):
+    if lines:
+        quantity = _quantity_case(lines)
+        Product.objects.filter(pk__in=list(lines)).update(
+            stock_count=F('stock_count') + quantity, updated_at=Now()
+        )
+
+
+def reservation_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+
+
+def reserve(order, lines, expires_at=None):
+    """Record held reservations for stock already taken by ``decrement_stock``."""
+    expires_at = expires_at or reservation_expiry()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in lines.items()
+    ])
+    return expires_at
+
+
+def _release(reservations):
+    """
+    Give back the stock of the held reservations among ``reservations``.
+    They are locked first, so two concurrent releases can't both return the
+    stock. Returns the number of units released.
+    """
+    with transaction.atomic():
+        held = list(
+            reservations.select_for_update()
+            .filter(status=StockReservation.HELD)
+            .values_list('id', 'product_id', 'quantity')
+        )
+        if not held:
+            return 0
+        StockReservation.objects.filter(pk__in=[row[0] for row in held]).update(
+            status=StockReservation.RELEASED, updated_at=Now()
+        )
+        lines = {}
+        for _, product_id, quantity in held:
+            lines[product_id] = lines.get(product_id, 0) + quantity
+        increment_stock(lines)
+        catalog_cache.invalidate_products(
+            Product.objects.only('id', 'category').order_by().in_bulk(list(lines)).values()
+        )
+    return sum(lines.values())
+
+
+def release_order(order):
+    """Give back the stock of every reservation the order still holds."""
+    return _release(StockReservation.objects.filter(order=order))
+
+
+def commit_order(order):
+    """Keep the order's stock for good; committed reservations never expire."""
+    return StockReservation.objects.filter(
+        order=order, status=StockReservation.HELD
+    ).update(status=StockReservation.COMMITTED, updated_at=Now())
+
+
+def order_status_changed(order, old_status, new_status):
+    # Stock released by a cancellation is not taken again if the order is
+    # later moved out of 'cancelled'
+    if new_status == 'cancelled':
+        release_order(order)
+    elif new_status in COMMITTED_STATUSES:
+        commit_order(order)
+
+
+def release_expired(now=None):
+    """
+    Give back the stock of held reservations past their expiry. Their orders
+    are left as they are; confirming one later doesn't take the stock again,
+    as with a cancelled order. Returns the number of units released.
+    """
+    return _release(StockReservation.objects.filter(expires_at__lte=now or timezone.now()))
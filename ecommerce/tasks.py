@@ -0,0 +1,30 @@
+"""
+Background tasks run by ``manage.py runworker``. Tasks may run more than
+once (a retry after a timeout, a worker that died mid-job), so each one
+checks the current state before acting.
+"""
+from django.core.mail import send_mail
+
+from .jobs import task
+from .models import Order
+
+
+ORDER_EVENT_SUBJECTS = {
+    'placed': 'We received your order #{id}',
+    'confirmed': 'Your order #{id} is confirmed',
+    'shipped': 'Your order #{id} has shipped',
+    'delivered': 'Your order #{id} was delivered',
+    'cancelled': 'Your order #{id} was cancelled',
+}
+
+
+@task()
+def send_order_notification(order_id, event):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    subject = ORDER_EVENT_SUBJECTS.get(event)
+    if order is None or subject is None or order.user is None or not order.user.email:
+        return
+    lines = [f'Order #{order.id} status: {order.get_status_display()}']
+    if order.tracking_number:
+        lines.append(f'Tracking number: {order.tracking_number} ({order.carrier or "carrier pending"})')
+    send_mail(subject.format(id=order.id), '\n'.join(lines), None, [order.user.email])
@@ -1,3 +1,1812 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+import re
+import threading
+import time
+import unittest
+import uuid
+from importlib import import_module
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command, CommandError
+from django.core.cache import caches
+from django.db import connection, connections, OperationalError
+from django.db.models import Avg, Count, Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from . import (
+    apikeys, attributes, benchmarks, compression, idempotency, importers, jobs, metrics, renderers, rollups,
+    search, stock
+)
+from .models import (
+    Product, ProductAttribute, Order, OrderItem, Review, SalesDailyRollup, StockReservation, IdempotencyKey,
+    Job, APIKey
+)
+from .importers import import_products
+from .orders import place_order, OrderPlacementError
+from .pagination import EstimatedCountPaginator
+from .renderers import FastJSONRenderer, FastJSONParser
+from .ratings import reconcile_ratings
+from .replicas import ReplicaRouter, use_replica
+from . import cache as catalog_cache
+from .views import ProductViewSet
+from .serializers import ProductSummarySerializer, ProductDetailSerializer, OrderItemSerializer
+
+
+class OrderReadQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='buyer')
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', price=10 + i, stock_count=100)
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_amount=0)
+            for product in self.products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(1)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.json()), 1)
+
+        self.create_orders(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(len(response.json()), 21)
+
+    def test_order_retrieve_includes_item_names(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/orders/{order.id}/')
+        data = response.json()
+        self.assertEqual(data['order_id'], order.id)
+        self.assertEqual(
+            sorted(item['name'] for item in data['order_details']['products']),
+            ['Product 0', 'Product 1', 'Product 2']
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite EXPLAIN')
+class QueryPlanTests(TestCase):
+    """
+    Run the hot endpoints, EXPLAIN every SELECT they issue and fail when a
+    filtered or ordered query reads a whole ecommerce table without an
+    index. Unfiltered whole-table aggregates are exempt since they have to
+    read every row anyway.
+    """
+    FULL_SCAN_RE = re.compile(r'^SCAN (ecommerce_\w+)$')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='buyer')
+        cls.product = None
+        for i in range(30):
+            product = Product.objects.create(
+                name=f'Product {i}', price=i, category='books' if i % 2 else 'food',
+                stock_count=i % 3
+            )
+            Review.objects.create(product=product, user=cls.user, rating=1 + i % 5)
+            cls.product = product
+        for i in range(10):
+            order = Order.objects.create(user=cls.user, total_amount=10, status='pending')
+            OrderItem.objects.create(order=order, product=cls.product, quantity=1, price=10)
+        cls.order = order
+
+    def full_scans(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        return [detail for detail in plan if self.FULL_SCAN_RE.match(detail)]
+
+    def is_exempt(self, sql):
+        return ' WHERE ' not in sql and ' ORDER BY ' not in sql
+
+    def assert_no_full_scans(self, url):
+        # Make sure the request reaches the database
+        caches['catalog'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or self.is_exempt(sql):
+                continue
+            self.assertEqual(self.full_scans(sql), [], f'{url}: {sql}')
+
+    def test_product_endpoints(self):
+        urls = [
+            '/api/products/',
+            '/api/products/?category=food',
+            '/api/products/?ordering=price',
+            '/api/products/?ordering=name',
+            '/api/products/?ordering=-rating_avg',
+            '/api/products/?cursor=&ordering=price',
+            '/api/products/?cursor=&category=books',
+            '/api/products/search/?min_price=2&max_price=5',
+            '/api/products/search/?category=food&min_price=2',
+            '/api/products/search/?q=product',
+            '/api/products/?spec.brand=acme&spec.ram__gte=8',
+            '/api/products/search/?spec.color=red&min_price=2',
+            '/api/products/facets/?min_price=2&category=books',
+            f'/api/products/{self.product.pk}/',
+            f'/api/products/{self.product.pk}/reviews/',
+        ]
+        for url in urls:
+            self.assert_no_full_scans(url)
+
+    def test_order_endpoints(self):
+        for url in [
+            '/api/orders/?cursor=',
+            f'/api/orders/?user_id={self.user.pk}',
+            f'/api/orders/{self.order.pk}/',
+        ]:
+            self.assert_no_full_scans(url)
+
+    def test_dashboard(self):
+        self.assert_no_full_scans('/api/admin/dashboard/')
+
+    def test_order_status_and_stock_filters(self):
+        querysets = [
+            Order.objects.filter(status='pending').order_by('-created_at'),
+            Product.objects.filter(stock_count=0),
+        ]
+        for queryset in querysets:
+            sql, params = queryset.query.sql_with_params()
+            self.assertEqual(self.full_scans(sql, params), [], sql)
+
+
+class FastSerializerParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='reviewer')
+        cls.products = [
+            Product.objects.create(name='Plain', price='0.00'),
+            Product.objects.create(
+                name='Full', price='1234.5', category='books', stock_count=7,
+                thumbnail='https://example.com/full.png'
+            ),
+            Product.objects.create(name='Cheap', price='0.1', category='food', stock_count=-1),
+        ]
+        Review.objects.create(product=cls.products[1], user=user, rating=4)
+        Review.objects.create(product=cls.products[1], user=user, rating=5)
+
+    def test_product_summary_fast_path_matches_serializer(self):
+        queryset = Product.objects.order_by('id')
+        expected = ProductSummarySerializer(queryset, many=True).data
+        fast = ProductSummarySerializer.fast_data(ProductSummarySerializer.values_queryset(queryset))
+        self.assertEqual(fast, expected)
+        self.assertEqual([list(row) for row in fast], [list(row) for row in expected])
+
+    def test_order_item_fast_path_matches_serializer(self):
+        order = Order.objects.create(total_amount='10.00')
+        OrderItem.objects.create(order=order, product=self.products[1], quantity=2, price='2469')
+        OrderItem.objects.create(order=order, product=None, quantity=1, price=None)
+        items = list(order.items.select_related('product'))
+        self.assertEqual(OrderItemSerializer.fast_data(items), OrderItemSerializer(items, many=True).data)
+
+
+class FastJSONParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='renderer')
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Caf\u00e9 {i}', price=Decimal('19.90') * i, category='food', stock_count=i,
+                specifications={'size': i, 'tags': ['a', 'b']}
+            )
+            Review.objects.create(product=product, user=cls.user, rating=i + 1, comment='line\u2028break')
+        order = Order.objects.create(user=cls.user, total_amount=Decimal('39.80'))
+        OrderItem.objects.create(order=order, product=product, quantity=2, price=Decimal('39.80'))
+        cls.order = order
+        cls.product = product
+
+    def assert_same_bytes(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data, accepted_media_type), expected)
+
+    def test_types_render_like_drf(self):
+        moment = datetime(2026, 3, 4, 5, 6, 7, 891011, tzinfo=dt_timezone.utc)
+        self.assert_same_bytes({
+            'decimals': [Decimal('12.30'), Decimal('0.1'), Decimal('-3'), Decimal('1E+2')],
+            'utc': moment,
+            'offset': moment.astimezone(dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2026, 1, 2, 3, 4, 5),
+            'whole_second': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            'date': date(2026, 1, 2),
+            'time': dt_time(13, 14, 15, 16),
+            'duration': timedelta(hours=1, microseconds=5),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('Pending'),
+            'error': ErrorDetail('This field is required.', code='required'),
+            'text': 'na\u00efve \u2603 \u2028 \u2029 "quoted" \\ \n',
+            'numbers': [0, -1, 2 ** 63 - 1, 1.5, 0.1, 4.25, True, False, None],
+            1: 'int key',
+            'nested': ({'tuple': (1, 2)}, []),
+            'queryset': Product.objects.order_by('pk').values_list('name', flat=True),
+        })
+        self.assert_same_bytes({'big': 2 ** 70})
+        self.assert_same_bytes({'a': [1, {'b': 2}]}, 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_api_responses_are_unchanged(self):
+        caches['catalog'].clear()
+        for url in [
+            '/api/products/',
+            '/api/products/?cursor=',
+            f'/api/products/{self.product.pk}/',
+            f'/api/products/{self.product.pk}/reviews/',
+            '/api/products/facets/',
+            '/api/orders/',
+            f'/api/orders/{self.order.pk}/',
+            '/api/async/products/',
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            data = getattr(response, 'data', None)
+            if data is None:
+                data = json.loads(response.content)
+            self.assertEqual(response.content, JSONRenderer().render(data), url)
+
+    def test_parser_matches_drf(self):
+        documents = [b'{"a": 1.5, "b": [1, "x", null, true]}', b'{"big": 1180591620717411303424}', b'[]']
+        for document in documents:
+            expected = JSONParser().parse(io.BytesIO(document))
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(document)), expected)
+        for document in [b'{"a": NaN}', b'{"a": ', b'\xff']:
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(document))
+
+    def test_api_accepts_json_bodies(self):
+        response = self.client.post(
+            '/api/orders/', json.dumps({'products': [{'product_id': self.product.pk, 'quantity': 1}]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post('/api/orders/', '{"products": [', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductAttributeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptop = Product.objects.create(name='Laptop', price=900, category='computers', specifications={
+            'brand': 'Acme', 'ram': '16GB', 'display': {'size': 15.6}, 'ports': ['usb-c', 'hdmi'], 'touch': False,
+        })
+        cls.netbook = Product.objects.create(name='Netbook', price=300, category='computers', specifications={
+            'brand': 'Globex', 'ram': '8 GB', 'display': {'size': 11},
+        })
+        cls.tablet = Product.objects.create(name='Tablet', price=400, category='electronics', specifications={
+            'brand': 'acme', 'ram': '4GB',
+        })
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_specifications_are_flattened(self):
+        self.assertEqual(sorted(attributes.extract_attributes(self.laptop.specifications)), [
+            ('brand', 'acme', None),
+            ('display.size', '15.6', 15.6),
+            ('ports', 'hdmi', None),
+            ('ports', 'usb-c', None),
+            ('ram', '16gb', 16.0),
+            ('touch', 'false', None),
+        ])
+        self.assertEqual(attributes.extract_attributes('{"Color": " Red "}'), [('color', 'red', None)])
+        self.assertEqual(attributes.extract_attributes('not json'), [])
+        self.assertEqual(attributes.extract_attributes(None), [])
+
+    def test_rows_follow_saves_imports_and_rebuilds(self):
+        self.netbook.specifications = {'brand': 'Initech'}
+        self.netbook.save()
+        self.assertEqual(
+            list(self.netbook.attributes.values_list('key', 'value')), [('brand', 'initech')]
+        )
+        import_products([{'name': 'Phone', 'price': '99.00', 'specifications': {'brand': 'Hooli'}}])
+        self.assertTrue(ProductAttribute.objects.filter(key='brand', value='hooli').exists())
+
+        ProductAttribute.objects.all().delete()
+        self.assertEqual(attributes.rebuild_index(batch_size=2), 4)
+        self.assertEqual(ProductAttribute.objects.filter(key='brand').count(), 4)
+        self.tablet.delete()
+        self.assertEqual(ProductAttribute.objects.filter(key='brand').count(), 3)
+
+    def test_migration_backfill_matches_the_live_index(self):
+        indexed = sorted(ProductAttribute.objects.values_list('product_id', 'key', 'value', 'num_value'))
+        ProductAttribute.objects.all().delete()
+        import_module('ecommerce.migrations.0013_product_attribute').backfill_attributes(django_apps, None)
+        self.assertEqual(
+            sorted(ProductAttribute.objects.values_list('product_id', 'key', 'value', 'num_value')), indexed
+        )
+
+    def test_list_filters_on_values_and_ranges(self):
+        laptop, netbook, tablet = self.laptop.pk, self.netbook.pk, self.tablet.pk
+        self.assertEqual(self.ids('/api/products/?spec.brand=ACME'), {laptop, tablet})
+        self.assertEqual(self.ids('/api/products/?spec.brand=acme&spec.brand=globex'), {laptop, netbook, tablet})
+        self.assertEqual(self.ids('/api/products/?spec.brand=acme&spec.ram__gte=8'), {laptop})
+        self.assertEqual(self.ids('/api/products/?spec.ram__gte=5&spec.ram__lte=16'), {laptop, netbook})
+        self.assertEqual(self.ids('/api/products/?spec.display.size__lt=12'), {netbook})
+        self.assertEqual(self.ids('/api/products/?spec.ports=hdmi&category=computers'), {laptop})
+        self.assertEqual(self.ids('/api/products/?spec.brand=&cursor='), {laptop, netbook, tablet})
+
+        response = self.client.get('/api/products/?spec.ram__gte=lots')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('spec.ram__gte', response.json())
+
+    def test_search_and_facets_apply_spec_filters(self):
+        self.assertEqual(self.ids('/api/products/search/?spec.brand=acme&max_price=500'), {self.tablet.pk})
+        facets = self.client.get('/api/products/facets/?spec.brand=acme&category=computers').json()
+        self.assertEqual(facets['count'], 1)
+        counts = {entry['value']: entry['count'] for entry in facets['categories'] if entry['count']}
+        self.assertEqual(counts, {'computers': 1, 'electronics': 1})
+
+
+@unittest.skipUnless(search.is_supported(), 'SQLite FTS5 is not available')
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(name='Steel kettle', price=10, description='Boils water', category='home_kitchen')
+        Product.objects.create(name='Tea set', price=10, description='Goes well with a kettle')
+        cls.book = Product.objects.create(name='Cookbook', price=10, description='Recipes', category='books')
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def indexed(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT name FROM {search.FTS_TABLE} WHERE rowid = %s', [product_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def matches(self, query):
+        return list(search.search_products(Product.objects.all(), query).values_list('name', flat=True))
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.indexed(self.book.pk), ['Cookbook'])
+        self.book.name = 'Baking guide'
+        self.book.save()
+        self.assertEqual(self.indexed(self.book.pk), ['Baking guide'])
+        self.assertEqual(self.matches('baking'), ['Baking guide'])
+        self.assertEqual(self.matches('cookbook'), [])
+
+        book_id = self.book.pk
+        self.book.delete()
+        self.assertEqual(self.indexed(book_id), [])
+        self.assertEqual(self.matches('baking'), [])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.matches('kettle'), ['Steel kettle', 'Tea set'])
+        response = self.client.get('/api/products/search/?q=kettle')
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Steel kettle', 'Tea set'])
+
+    def test_last_word_matches_as_a_prefix(self):
+        self.assertEqual(self.matches('ket'), ['Steel kettle', 'Tea set'])
+        self.assertEqual(self.matches('steel ket'), ['Steel kettle'])
+        self.assertEqual(self.matches('kitchen'), ['Steel kettle'])
+
+    def test_punctuation_only_queries_match_everything(self):
+        for query in ['"', '*', '-', '()', 'AND', '"kettle']:
+            response = self.client.get('/api/products/search/', {'q': query})
+            self.assertEqual(response.status_code, 200, query)
+        self.assertEqual(search.build_match_expression('?!*"'), '')
+        self.assertEqual(len(self.matches('?!*"')), 3)
+        self.assertEqual(self.matches('"kettle'), ['Steel kettle', 'Tea set'])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='pager')
+        # Three products at each price, so pages have to break ties on id
+        cls.products = [
+            Product.objects.create(name=f'Product {i}', price=i // 3, category='books' if i % 2 else 'food')
+            for i in range(9)
+        ]
+        cls.product = cls.products[0]
+        for rating in range(1, 6):
+            Review.objects.create(product=cls.product, user=cls.user, rating=rating)
+        Review.objects.update(date=timezone.now())
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json()
+
+    def walk(self, url):
+        pages, data = [], self.get(url)
+        while True:
+            pages.append(data)
+            if not data['next']:
+                return pages
+            data = self.get(data['next'])
+
+    def ids(self, page):
+        return [row['id'] for row in page['results']]
+
+    def token(self, cursor):
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    def test_pages_cover_ties_forwards_and_backwards(self):
+        pages = self.walk('/api/products/?cursor=&ordering=price&limit=2')
+        expected = [product.pk for product in sorted(self.products, key=lambda p: (p.price, p.pk))]
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], expected)
+        self.assertEqual(len(pages), 5)
+        self.assertIsNone(pages[0]['previous'])
+
+        walked_back = [self.ids(pages[-1])]
+        data = pages[-1]
+        while data['previous']:
+            data = self.get(data['previous'])
+            walked_back.insert(0, self.ids(data))
+        self.assertEqual(walked_back, [self.ids(page) for page in pages])
+
+    def test_descending_order_and_filters(self):
+        pages = self.walk('/api/products/?cursor=&ordering=-price&category=books&limit=2')
+        books = [p for p in self.products if p.category == 'books']
+        expected = [product.pk for product in sorted(books, key=lambda p: (-p.price, -p.pk))]
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], expected)
+
+    def test_review_pages_break_ties_on_id(self):
+        pages = self.walk(f'/api/products/{self.product.pk}/reviews/?limit=2')
+        self.assertEqual([[row['rating'] for row in page['results']] for page in pages], [[5, 4], [3, 2], [1]])
+
+    def test_count_modes(self):
+        self.assertNotIn('count', self.get('/api/products/?cursor=&limit=2'))
+        self.assertEqual(self.get('/api/products/?cursor=&limit=2&count=exact')['count'], 9)
+        data = self.get('/api/products/?cursor=&limit=2&count=estimate')
+        self.assertEqual(data['count'], 9)
+        self.assertNotIn('count_is_estimate', data)
+        caches['catalog'].clear()
+        with mock.patch('ecommerce.pagination.KeysetPagination.estimate_cap', 5):
+            data = self.get('/api/products/?cursor=&limit=2&count=estimate')
+        self.assertEqual((data['count'], data['count_is_estimate']), (5, True))
+        self.assertNotIn('count', self.get('/api/products/?cursor=&limit=2&count=bogus'))
+
+    def test_invalid_cursors_are_not_found(self):
+        tokens = [
+            'not base64!',
+            self.token(['created_at', 1]),
+            self.token('created_at'),
+            self.token({'f': 'price', 'v': 1, 'id': 1}),
+            self.token({'f': 'created_at', 'v': 'garbage', 'id': 1}),
+            self.token({'f': 'created_at', 'v': {'a': 1}, 'id': 1}),
+            self.token({'f': 'created_at', 'v': '2026-01-01T00:00:00+00:00', 'id': [1]}),
+            self.token({'f': 'created_at', 'v': None, 'id': 1}),
+            self.token({'f': 'created_at', 'v': '2026-01-01T00:00:00+00:00', 'id': 'one'}),
+        ]
+        for url in ['/api/products/', f'/api/products/{self.product.pk}/reviews/']:
+            for token in tokens:
+                response = self.client.get(url, {'cursor': token})
+                self.assertEqual(response.status_code, 404, (url, token))
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+        self.assertEqual(self.client.get('/api/products/', {
+            'cursor': self.token({'f': 'price', 'v': 'x', 'id': 1}), 'ordering': 'price'
+        }).status_code, 404)
+
+
+class ProductReviewsEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='Reviewed', price=10)
+        other = Product.objects.create(name='Other', price=10)
+        for i in range(8):
+            user = User.objects.create(username=f'critic-{i}')
+            Review.objects.create(product=cls.product, user=user, rating=1 + i % 5, comment=f'Review {i}')
+            Review.objects.create(product=other, user=user, rating=3)
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def test_newest_reviews_of_the_product_come_first(self):
+        response = self.client.get(f'/api/products/{self.product.pk}/reviews/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['comment'] for row in data['results']], ['Review 7', 'Review 6', 'Review 5'])
+        self.assertEqual(set(data['results'][0]), {'user', 'rating', 'comment', 'date'})
+        self.assertEqual(data['results'][0]['user'], 'critic-7')
+        self.assertIsNone(data['previous'])
+        self.assertIn('cursor=', data['next'])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        # Product check and the page with its users
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/products/{self.product.pk}/reviews/?limit=2')
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{self.product.pk}/reviews/?limit=8')
+        self.assertEqual(len(response.json()['results']), 8)
+        self.assertIsNone(response.json()['next'])
+
+    def test_detail_embeds_only_a_preview(self):
+        data = self.client.get(f'/api/products/{self.product.pk}/').json()
+        self.assertEqual(len(data['reviews']), ProductDetailSerializer.REVIEW_PREVIEW_SIZE)
+        self.assertEqual(data['reviews'][0]['comment'], 'Review 7')
+
+    def test_unknown_product_is_not_found(self):
+        response = self.client.get('/api/products/999999/reviews/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Product not found'})
+
+
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='async-buyer')
+        cls.products = [
+            Product.objects.create(
+                name=f'Async lamp {i}', price=5 + i, category='books' if i % 2 else 'food', stock_count=i
+            )
+            for i in range(25)
+        ]
+        cls.product = cls.products[-1]
+        Review.objects.create(product=cls.product, user=user, rating=4, comment='Bright')
+        cls.order = Order.objects.create(user=user, total_amount=Decimal('11.00'))
+        OrderItem.objects.create(order=cls.order, product=cls.product, quantity=1, price=Decimal('11.00'))
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    async def assert_same_as_drf(self, async_path, drf_path):
+        response = await self.async_client.get(async_path)
+        expected = await self.async_client.get(drf_path)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/json'))
+        data = response.json()
+        for key in ('next', 'previous'):
+            if isinstance(data, dict) and data.get(key):
+                data[key] = data[key].replace('/api/async/', '/api/')
+        self.assertEqual(data, expected.json())
+        return data
+
+    async def test_product_list_matches_the_drf_endpoint(self):
+        data = await self.assert_same_as_drf('/api/async/products/', '/api/products/')
+        self.assertEqual((data['count'], len(data['results'])), (25, 20))
+        data = await self.assert_same_as_drf(
+            '/api/async/products/?page=2&limit=5&category=books&ordering=price',
+            '/api/products/?page=2&limit=5&category=books&ordering=price'
+        )
+        self.assertEqual(data['count'], 12)
+        self.assertIsNotNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    async def test_search_and_detail_match_the_drf_endpoints(self):
+        await self.assert_same_as_drf(
+            '/api/async/products/search/?max_price=10', '/api/products/search/?max_price=10'
+        )
+        data = await self.assert_same_as_drf(
+            f'/api/async/products/{self.product.pk}/', f'/api/products/{self.product.pk}/'
+        )
+        self.assertEqual(data['reviews'][0]['comment'], 'Bright')
+        data = await self.assert_same_as_drf(
+            f'/api/async/orders/{self.order.pk}/', f'/api/orders/{self.order.pk}/'
+        )
+        self.assertEqual(data['order_details']['products'][0]['name'], 'Async lamp 24')
+
+    async def test_missing_rows_and_pages_are_not_found(self):
+        for path in [
+            '/api/async/products/999999/',
+            '/api/async/orders/999999/',
+            '/api/async/products/?page=9',
+            '/api/async/products/?page=0',
+            '/api/async/products/?page=last',
+        ]:
+            response = await self.async_client.get(path)
+            self.assertEqual(response.status_code, 404, path)
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Product.objects.create(name='Novel', price=10, category='books')
+        cls.apple = Product.objects.create(name='Apple', price=1, category='food')
+        cls.user = User.objects.create(username='cache-reviewer')
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def get(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertIn(response.status_code, (200, 304), url)
+        return response
+
+    def save(self, product, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in changes.items():
+                setattr(product, name, value)
+            product.save()
+
+    def versions(self, *scopes):
+        return dict(zip(scopes, catalog_cache.get_versions(scopes)))
+
+    def test_product_save_bumps_its_scopes(self):
+        scopes = (
+            catalog_cache.ALL_SCOPE, catalog_cache.product_scope(self.book.pk),
+            catalog_cache.product_scope(self.apple.pk), catalog_cache.category_scope('books'),
+            catalog_cache.category_scope('food'), catalog_cache.category_scope('music'),
+        )
+        before = self.versions(*scopes)
+        self.save(self.book, category='music')
+        after = self.versions(*scopes)
+        changed = {scope for scope in scopes if before[scope] != after[scope]}
+        self.assertEqual(changed, {
+            catalog_cache.ALL_SCOPE, catalog_cache.product_scope(self.book.pk),
+            catalog_cache.category_scope('books'), catalog_cache.category_scope('music'),
+        })
+
+    def test_invalidation_waits_for_commit(self):
+        scope = catalog_cache.product_scope(self.book.pk)
+        before = self.versions(scope)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.book.save()
+        self.assertEqual(self.versions(scope), before)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_list_and_detail_are_served_from_cache_until_a_save(self):
+        for url in ['/api/products/', f'/api/products/{self.book.pk}/', '/api/products/?category=books']:
+            self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+
+        self.save(self.book, name='Epic')
+        for url in ['/api/products/', f'/api/products/{self.book.pk}/', '/api/products/?category=books']:
+            response = self.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS', url)
+            self.assertIn('Epic', response.content.decode())
+
+    def test_category_change_invalidates_both_categories_only(self):
+        for category in ['books', 'music', 'food']:
+            self.get(f'/api/products/?category={category}')
+        self.get(f'/api/products/{self.apple.pk}/')
+
+        self.save(self.book, category='music')
+        self.assertEqual(self.get('/api/products/?category=books').json()['count'], 0)
+        self.assertEqual(self.get('/api/products/?category=music').json()['count'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/products/?category=food')['X-Cache'], 'HIT')
+            self.assertEqual(self.get(f'/api/products/{self.apple.pk}/')['X-Cache'], 'HIT')
+
+    def test_new_reviews_invalidate_the_product(self):
+        url = f'/api/products/{self.book.pk}/'
+        self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(product=self.book, user=self.user, rating=5)
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['reviews']), 1)
+
+    def test_if_none_match_gets_a_304_until_the_product_changes(self):
+        url = f'/api/products/{self.book.pk}/'
+        etag = self.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.get(url, if_none_match=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(catalog_cache.stats()['not_modified'], 2)
+
+        self.save(self.book, price=12)
+        response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_none_match_star_needs_a_cached_representation(self):
+        url = f'/api/products/{self.book.pk}/'
+        self.assertEqual(self.client.get('/api/products/999999/', headers={'If-None-Match': '*'}).status_code, 404)
+        self.assertEqual(self.get(url, if_none_match='*').status_code, 200)
+        self.assertEqual(self.get(url, if_none_match='*').status_code, 304)
+
+    def test_imports_invalidate_once_per_transaction(self):
+        rows = [{'name': f'Import {i}', 'price': '5.00', 'category': ['books', 'food'][i % 2]} for i in range(5)]
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            import_products(rows, chunk_size=2)
+        self.assertEqual(len(callbacks), 1)
+        with mock.patch.object(catalog_cache, 'bump') as bump:
+            callbacks[0]()
+        self.assertCountEqual(bump.call_args.args, [
+            catalog_cache.ALL_SCOPE, catalog_cache.category_scope('books'), catalog_cache.category_scope('food'),
+        ])
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name, price, category, stock_count in [
+            ('Red book', 10, 'books', 5),
+            ('Blue book', 30, 'books', 0),
+            ('Red kettle', 30, 'home_kitchen', 2),
+            ('Rare kettle', 2000, 'home_kitchen', 1),
+            ('Apple', 1, 'food', 0),
+        ]:
+            Product.objects.create(name=name, price=price, category=category, stock_count=stock_count)
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def get_facets(self, query=''):
+        response = self.client.get('/api/products/facets/' + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def counts(self, entries, key):
+        return {entry[key]: (entry['count'], entry['in_stock']) for entry in entries if entry['count']}
+
+    def test_counts_come_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            facets = self.get_facets()
+        self.assertEqual((facets['count'], facets['in_stock']), (5, 3))
+        self.assertEqual(
+            self.counts(facets['categories'], 'value'),
+            {'books': (2, 1), 'home_kitchen': (2, 2), 'food': (1, 0)}
+        )
+        self.assertEqual(self.counts(facets['price_ranges'], 'min'), {0: (2, 1), 25: (2, 1), 1000: (1, 1)})
+        self.assertEqual(len(facets['categories']), len(Product.CATEGORY_CHOICES))
+
+    def test_selected_category_keeps_the_other_category_counts(self):
+        facets = self.get_facets('?category=books&max_price=100')
+        self.assertEqual((facets['count'], facets['in_stock']), (2, 1))
+        self.assertEqual(
+            self.counts(facets['categories'], 'value'),
+            {'books': (2, 1), 'home_kitchen': (1, 1), 'food': (1, 0)}
+        )
+        self.assertEqual(self.counts(facets['price_ranges'], 'min'), {0: (1, 1), 25: (1, 0)})
+
+    @unittest.skipUnless(search.is_supported(), 'SQLite FTS5 is not available')
+    def test_search_query_narrows_the_facets(self):
+        facets = self.get_facets('?q=red')
+        self.assertEqual(
+            self.counts(facets['categories'], 'value'), {'books': (1, 1), 'home_kitchen': (1, 1)}
+        )
+
+    def test_cached_until_any_product_changes(self):
+        self.get_facets('?category=food')
+        with self.assertNumQueries(0):
+            self.get_facets('?category=food')
+
+        product = Product.objects.get(name='Rare kettle')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock_count = 0
+            product.save()
+        facets = self.get_facets('?category=food')
+        self.assertEqual(self.counts(facets['categories'], 'value')['home_kitchen'], (2, 1))
+
+
+class OrderPlacementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(id=1, username='buyer')
+        cls.user = User.objects.get(pk=1)
+        cls.products = [
+            Product.objects.create(
+                name=f'Item {i}', price=10 + i, category='books' if i % 2 else 'food', stock_count=5
+            )
+            for i in range(6)
+        ]
+
+    def lines(self, products, quantity=1):
+        return [{'product_id': product.pk, 'quantity': quantity} for product in products]
+
+    def stock_counts(self):
+        return list(Product.objects.order_by('pk').values_list('stock_count', flat=True))
+
+    def test_items_totals_and_repeated_products(self):
+        first, second = self.products[:2]
+        order = place_order(self.user, self.lines([first, second, first], quantity=2))
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity', 'price')),
+            [(first.pk, 4, Decimal('40.00')), (second.pk, 2, Decimal('22.00'))]
+        )
+        self.assertEqual(order.total_amount, Decimal('62.00'))
+        self.assertEqual(self.stock_counts()[:2], [1, 3])
+
+    def test_insufficient_stock_rolls_everything_back(self):
+        lines = self.lines(self.products[:2]) + [{'product_id': self.products[2].pk, 'quantity': 6}]
+        with self.assertRaises(OrderPlacementError) as raised:
+            place_order(self.user, lines)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertIn('Insufficient stock for product Item 2', raised.exception.message)
+        self.assertEqual(self.stock_counts(), [5] * 6)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_query_count_does_not_grow_with_items(self):
+        # Create the rollup rows first so every order only updates them
+        place_order(self.user, self.lines(self.products[:2]))
+        with CaptureQueriesContext(connection) as two_items:
+            place_order(self.user, self.lines(self.products[:2]))
+        with CaptureQueriesContext(connection) as six_items:
+            place_order(self.user, self.lines(self.products))
+        self.assertEqual(len(six_items), len(two_items))
+        # Savepoint and release, product fetch, stock UPDATE, order, items,
+        # reservations, one rollup UPDATE each for the two categories and
+        # two for the whole-order bucket, and the notification job
+        self.assertEqual(len(six_items), 12)
+
+    def test_unknown_product_is_not_found(self):
+        response = self.client.post(
+            '/api/orders/', {'products': self.lines(self.products[:1]) + [{'product_id': 999_999}]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Product 999999 not found'})
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock_counts(), [5] * 6)
+
+    def test_invalid_lines_are_rejected(self):
+        for products in [[], [{'product_id': self.products[0].pk, 'quantity': 0}], [{'quantity': 1}]]:
+            with self.assertRaises(OrderPlacementError) as raised:
+                place_order(self.user, products)
+            self.assertEqual(raised.exception.status_code, 400)
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def rows(self, count):
+        return [{'name': f'Imported {i}', 'price': f'{i + 1}.50', 'category': 'books'} for i in range(count)]
+
+    def post(self, body, content_type='application/json', chunk_size=None):
+        query = f'?chunk_size={chunk_size}' if chunk_size else ''
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        return self.client.post('/api/products/bulk_create/' + query, body, content_type=content_type)
+
+    def test_valid_rows_are_created_across_chunks(self):
+        response = self.post(self.rows(5), chunk_size=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['name'] for row in response.json()], [f'Imported {i}' for i in range(5)])
+        self.assertEqual(Product.objects.count(), 5)
+        if search.is_supported():
+            self.assertEqual(len(search.search_products(Product.objects.all(), 'imported')), 5)
+
+    def test_one_bad_row_rejects_the_whole_import(self):
+        rows = self.rows(5)
+        rows[3]['price'] = 'free'
+        rows.insert(1, 'not an object')
+        response = self.post(rows, chunk_size=2)
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['error'], '2 invalid rows, nothing was imported')
+        self.assertEqual([error['row'] for error in body['errors']], [2, 5])
+        self.assertEqual(body['errors'][0]['errors'], {'non_field_errors': ['Expected an object']})
+        self.assertIn('price', body['errors'][1]['errors'])
+        self.assertFalse(Product.objects.exists())
+
+    def test_error_report_is_capped(self):
+        rows = [{'price': '1'}] * 150
+        with self.assertRaises(importers.ProductImportError) as raised:
+            import_products(rows, chunk_size=40)
+        self.assertEqual(raised.exception.error_count, 150)
+        self.assertEqual(len(raised.exception.errors), importers.MAX_REPORTED_ERRORS)
+        self.assertEqual(raised.exception.errors[-1]['row'], importers.MAX_REPORTED_ERRORS)
+
+    def test_ndjson_bodies_are_streamed(self):
+        body = '\n'.join(json.dumps(row) for row in self.rows(3)) + '\n\n'
+        response = self.post(body, content_type='application/x-ndjson', chunk_size=2)
+        self.assertEqual((response.status_code, response.json()), (201, {'created': 3}))
+
+        response = self.post(body + '{"name": \n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            {'row': 4, 'errors': {'non_field_errors': ['Invalid JSON']}}
+        ])
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_csv_bodies_are_streamed(self):
+        body = (
+            'name,price,category,specifications\r\n'
+            'Lamp,12.00,home_kitchen,"{""color"": ""red""}"\r\n'
+            'Mug,4.50,,\r\n'
+        )
+        response = self.post(body, content_type='text/csv; charset=utf-8', chunk_size=1)
+        self.assertEqual((response.status_code, response.json()), (201, {'created': 2}))
+        lamp = Product.objects.get(name='Lamp')
+        self.assertEqual((lamp.price, lamp.specifications), (Decimal('12.00'), {'color': 'red'}))
+
+        response = self.post('name,price,specifications\r\nBad,1,{oops\r\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['errors'], {
+            'non_field_errors': ['Invalid JSON in column specifications']
+        })
+
+    def test_bodies_without_a_content_length_are_read_or_rejected(self):
+        body = '\n'.join(json.dumps(row) for row in self.rows(2))
+        view = ProductViewSet.as_view({'post': 'bulk_create'}, **ProductViewSet.bulk_create.kwargs)
+        request = RequestFactory().post('/api/products/bulk_create/', body, content_type='application/x-ndjson')
+        # What a server that passes a chunked upload through looks like
+        del request.META['CONTENT_LENGTH']
+        response = view(request)
+        self.assertEqual((response.status_code, response.data), (201, {'created': 2}))
+
+        # The body can't be read at all, so nothing is reported as imported
+        response = self.client.post(
+            '/api/products/bulk_create/', body, content_type='application/x-ndjson', CONTENT_LENGTH=''
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'No products in the request body'})
+        self.assertEqual(Product.objects.count(), 2)
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f'reviewer-{i}') for i in range(3)]
+        cls.first = Product.objects.create(name='First', price=10)
+        cls.second = Product.objects.create(name='Second', price=10)
+
+    def review(self, product, rating, user=0):
+        return Review.objects.create(product=product, user=self.users[user], rating=rating)
+
+    def assert_counters(self, product, count, avg):
+        product.refresh_from_db(fields=['rating_count', 'rating_total', 'rating_avg'])
+        actual = Review.objects.filter(product=product).aggregate(count=Count('id'), total=Sum('rating'))
+        self.assertEqual((product.rating_count, product.rating_total), (actual['count'], actual['total'] or 0))
+        self.assertEqual(product.rating_count, count)
+        self.assertAlmostEqual(product.rating_avg, avg)
+
+    def test_counters_follow_creates_edits_moves_and_deletes(self):
+        review = self.review(self.first, 5)
+        self.review(self.first, 2, user=1)
+        self.assert_counters(self.first, 2, 3.5)
+
+        review.rating = 3
+        review.save()
+        self.assert_counters(self.first, 2, 2.5)
+
+        review.product = self.second
+        review.save()
+        self.assert_counters(self.first, 1, 2)
+        self.assert_counters(self.second, 1, 3)
+
+        review.delete()
+        self.assert_counters(self.second, 0, 0)
+        Review.objects.get().delete()
+        self.assert_counters(self.first, 0, 0)
+        self.assertEqual(reconcile_ratings(fix=False), 0)
+
+    def test_queryset_updates_are_repaired_by_reconcile(self):
+        self.review(self.first, 4)
+        self.review(self.first, 5, user=1)
+        Review.objects.update(rating=1)
+        self.assertEqual(reconcile_ratings(fix=False), 1)
+        self.assertEqual(reconcile_ratings(), 1)
+        self.assert_counters(self.first, 2, 1)
+        self.assert_counters(self.second, 0, 0)
+
+    def test_product_delete_takes_its_reviews_along(self):
+        self.review(self.first, 4)
+        self.review(self.second, 2)
+        self.first.delete()
+        self.assert_counters(self.second, 1, 2)
+
+    def test_migration_backfill_matches_an_aggregate(self):
+        backfill = import_module('ecommerce.migrations.0004_product_rating_aggregates').backfill_ratings
+        for user, rating in enumerate([5, 4, 4]):
+            self.review(self.first, rating, user=user)
+        self.review(self.second, 1)
+        Product.objects.update(rating_count=0, rating_total=0, rating_avg=0)
+
+        backfill(django_apps, None)
+        expected = {
+            row['pk']: (row['count'], row['total'] or 0, row['avg'] or 0)
+            for row in Product.objects.values('pk').annotate(
+                count=Count('reviews'), total=Sum('reviews__rating'), avg=Avg('reviews__rating')
+            )
+        }
+        stored = Product.objects.in_bulk()
+        self.assertEqual(stored.keys(), expected.keys())
+        for pk, (count, total, avg) in expected.items():
+            self.assertEqual((stored[pk].rating_count, stored[pk].rating_total), (count, total))
+            self.assertAlmostEqual(stored[pk].rating_avg, avg)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(id=1, username='buyer')
+        cls.book = Product.objects.create(name='Book', price=10, category='books', stock_count=50)
+        cls.apple = Product.objects.create(name='Apple', price=2, category='food', stock_count=50)
+        cls.loose = Product.objects.create(name='Loose', price=1, stock_count=50)
+
+    def buckets(self):
+        return {
+            (row.day, row.status, row.category): (row.orders, row.revenue, row.units)
+            for row in SalesDailyRollup.objects.all()
+            if row.orders or row.revenue or row.units
+        }
+
+    def assert_matches_rebuild(self):
+        incremental = self.buckets()
+        rollups.rebuild_rollups()
+        self.assertEqual(incremental, self.buckets())
+        for orders, revenue, units in incremental.values():
+            self.assertGreaterEqual(min(orders, revenue, units), 0)
+
+    def create_order(self, *lines, status='pending'):
+        order = Order.objects.create(
+            user=self.user, status=status,
+            total_amount=sum(product.price * quantity for product, quantity in lines)
+        )
+        for product, quantity in lines:
+            OrderItem.objects.create(
+                order=order, product=product, quantity=quantity, price=product.price * quantity
+            )
+        return order
+
+    def test_orders_created_outside_checkout_are_counted(self):
+        order = self.create_order((self.book, 2), (self.apple, 3), (self.loose, 1))
+        self.assertEqual(rollups.sales_totals(), (1, Decimal('27.00')))
+        self.assert_matches_rebuild()
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(rollups.sales_totals(), (1, Decimal('27.00')))
+        self.assert_matches_rebuild()
+
+        order.delete()
+        self.assertEqual(rollups.sales_totals(), (0, 0))
+        self.assertEqual(self.buckets(), {})
+
+    def test_checkout_orders_match_a_rebuild(self):
+        order = place_order(self.user, [
+            {'product_id': self.book.pk, 'quantity': 2}, {'product_id': self.loose.pk, 'quantity': 1}
+        ])
+        place_order(self.user, [{'product_id': self.apple.pk, 'quantity': 4}])
+        self.assertEqual(rollups.sales_totals(), (2, Decimal('29.00')))
+        self.assert_matches_rebuild()
+
+        order.status = 'confirmed'
+        order.save()
+        self.assert_matches_rebuild()
+        order.delete()
+        self.assertEqual(rollups.sales_totals(), (1, Decimal('8.00')))
+        self.assert_matches_rebuild()
+
+    def test_item_and_total_edits_follow_the_order(self):
+        order = self.create_order((self.book, 1), (self.apple, 1))
+        item = order.items.get(product=self.apple)
+        item.product = self.book
+        item.quantity = 2
+        item.save()
+        self.assert_matches_rebuild()
+
+        other = self.create_order((self.loose, 1))
+        item.order = other
+        item.save()
+        self.assert_matches_rebuild()
+
+        order.total_amount = Decimal('99.00')
+        order.status = 'shipped'
+        order.save()
+        self.assertEqual(rollups.sales_totals(), (2, Decimal('100.00')))
+        self.assert_matches_rebuild()
+
+        other.items.get(product=self.loose).delete()
+        self.assert_matches_rebuild()
+        OrderItem.objects.filter(order__in=[order, other]).delete()
+        self.assert_matches_rebuild()
+        Order.objects.all().delete()
+        self.assertEqual(self.buckets(), {})
+
+    def test_dashboard_totals(self):
+        self.create_order((self.book, 1))
+        self.create_order((self.apple, 5), status='delivered')
+        staff = User.objects.create(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/api/admin/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_orders'], 2)
+        self.assertEqual(response.context['total_revenue'], Decimal('20.00'))
+
+    def test_migration_backfills_existing_orders(self):
+        backfill = import_module('ecommerce.migrations.0006_sales_daily_rollup').backfill_rollups
+        place_order(self.user, [{'product_id': self.book.pk, 'quantity': 2}])
+        self.create_order((self.apple, 1), (self.loose, 2), status='delivered')
+        expected = self.buckets()
+        SalesDailyRollup.objects.all().delete()
+        backfill(django_apps, None)
+        self.assertEqual(self.buckets(), expected)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='exporter')
+        cls.staff = User.objects.create(username='export-staff', is_staff=True)
+        cls.products = [
+            Product.objects.create(name=f'Export {i}', price=5, category='books', stock_count=10)
+            for i in range(3)
+        ]
+        order = Order.objects.create(
+            user=cls.user, total_amount=5, payment_method_id='pm_secret', shipping_address={'city': 'Lagos'}
+        )
+        OrderItem.objects.create(order=order, product=cls.products[0], quantity=1, price=5)
+
+    def setUp(self):
+        # Everything was last changed a day ago
+        self.since = timezone.now() - timedelta(seconds=1)
+        Product.objects.update(updated_at=self.since - timedelta(days=1))
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return b''.join(response.streaming_content).decode()
+
+    def changed_products(self):
+        since = self.since.isoformat().replace('+00:00', 'Z')
+        body = self.export(f'/api/products/export/?updated_since={since}')
+        return [json.loads(line)['name'] for line in body.splitlines()]
+
+    def test_full_export_in_both_formats(self):
+        rows = [json.loads(line) for line in self.export('/api/products/export/').splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Export 0', 'Export 1', 'Export 2'])
+        lines = self.export('/api/products/export/?output=csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'description'])
+        self.assertEqual(len(lines), 4)
+
+    def test_incremental_export_picks_up_stock_and_rating_changes(self):
+        self.assertEqual(self.changed_products(), [])
+
+        order = place_order(self.user, [{'product_id': self.products[1].pk, 'quantity': 2}])
+        self.assertEqual(self.changed_products(), ['Export 1'])
+
+        Product.objects.update(updated_at=self.since - timedelta(days=1))
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(self.changed_products(), ['Export 1'])
+
+        Product.objects.update(updated_at=self.since - timedelta(days=1))
+        Review.objects.create(product=self.products[2], user=self.user, rating=4)
+        self.assertEqual(self.changed_products(), ['Export 2'])
+
+    def test_reconcile_only_touches_stale_products(self):
+        Product.objects.filter(pk=self.products[0].pk).update(rating_count=3, rating_total=9)
+        Product.objects.update(updated_at=self.since - timedelta(days=1))
+        self.assertEqual(reconcile_ratings(), 1)
+        self.assertEqual(self.changed_products(), ['Export 0'])
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/products/export/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/export/?updated_since=yesterday').status_code, 400)
+
+    def test_order_export_is_staff_only_and_leaves_out_payment_details(self):
+        self.assertIn(self.client.get('/api/orders/export/').status_code, (401, 403))
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        body = self.export('/api/orders/export/')
+        row = json.loads(body)
+        self.assertNotIn('payment_method_id', row)
+        self.assertEqual(row['shipping_address'], {'city': 'Lagos'})
+        self.assertEqual(row['items'], [{'product_id': self.products[0].pk, 'quantity': 1, 'price': '5.00'}])
+        self.assertNotIn('pm_secret', self.export('/api/orders/export/?output=csv'))
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='buyer')
+        cls.product = Product.objects.create(name='Widget', price=5, stock_count=10)
+
+    def place(self, quantity=3):
+        return place_order(self.user, [{'product_id': self.product.id, 'quantity': quantity}])
+
+    def stock_count(self):
+        self.product.refresh_from_db(fields=['stock_count'])
+        return self.product.stock_count
+
+    def test_placing_an_order_holds_its_stock(self):
+        order = self.place()
+        reservation = order.reservations.get()
+        self.assertEqual(reservation.status, StockReservation.HELD)
+        self.assertEqual(reservation.quantity, 3)
+        self.assertGreater(reservation.expires_at, timezone.now())
+        self.assertEqual(self.stock_count(), 7)
+
+    def test_cancelling_releases_stock_once(self):
+        order = self.place()
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(self.stock_count(), 10)
+        self.assertEqual(stock.release_order(order), 0)
+        self.assertEqual(self.stock_count(), 10)
+        self.assertEqual(order.reservations.get().status, StockReservation.RELEASED)
+
+    def test_confirmed_orders_keep_their_stock_after_expiry(self):
+        order = self.place()
+        order.status = 'confirmed'
+        order.save()
+        later = timezone.now() + timedelta(days=1)
+        self.assertEqual(stock.release_expired(now=later), 0)
+        self.assertEqual(order.reservations.get().status, StockReservation.COMMITTED)
+        self.assertEqual(self.stock_count(), 7)
+
+    def test_expired_reservations_return_stock_but_orders_stay_pending(self):
+        expired = self.place()
+        expired.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        current = self.place(quantity=2)
+        self.assertEqual(stock.release_expired(), 3)
+        self.assertEqual(stock.release_expired(), 0)
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'pending')
+        self.assertEqual(expired.reservations.get().status, StockReservation.RELEASED)
+        self.assertEqual(current.reservations.get().status, StockReservation.HELD)
+        self.assertEqual(self.stock_count(), 8)
+
+        # Cancelling afterwards doesn't give the stock back twice
+        expired.status = 'cancelled'
+        expired.save()
+        self.assertEqual(self.stock_count(), 8)
+
+    def test_deleting_a_pending_order_returns_its_stock(self):
+        self.place().delete()
+        self.assertEqual(self.stock_count(), 10)
+
+    def test_stale_stock_read_cannot_oversell(self):
+        # Both checkouts saw 10 in stock before either took any
+        stock.decrement_stock({self.product.id: 6})
+        with self.assertRaises(stock.StockUnavailable):
+            stock.decrement_stock({self.product.id: 6})
+        self.assertEqual(self.stock_count(), 4)
+
+
+class StockStressTests(TransactionTestCase):
+    """
+    Fire many parallel single-unit orders at one SKU. Lock errors from the
+    database are retried with backoff, as a client would.
+    """
+    orders = 1000
+    workers = 8
+    initial_stock = 250
+
+    def test_parallel_orders_never_oversell(self):
+        user = User.objects.create(username='buyer')
+        product = Product.objects.create(name='Hot item', price=5, stock_count=self.initial_stock)
+        outcomes = {'placed': 0, 'rejected': 0}
+        lock = threading.Lock()
+
+        def buy(_):
+            try:
+                for attempt in range(1, 1000):
+                    try:
+                        place_order(user, [{'product_id': product.id, 'quantity': 1}])
+                        outcome = 'placed'
+                    except OrderPlacementError:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        time.sleep(random.random() * 0.001 * attempt)
+                        continue
+                    with lock:
+                        outcomes[outcome] += 1
+                    return
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(buy, range(self.orders)))
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_count, 0)
+        self.assertEqual(outcomes, {'placed': self.initial_stock, 'rejected': self.orders - self.initial_stock})
+        self.assertEqual(StockReservation.objects.filter(product=product).count(), self.initial_stock)
+        self.assertEqual(Order.objects.count(), self.initial_stock)
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(id=1, username='buyer')
+        cls.product = Product.objects.create(name='Widget', price=5, stock_count=10)
+
+    def post_order(self, key, quantity=2):
+        return self.client.post(
+            '/api/orders/',
+            {'products': [{'product_id': self.product.id, 'quantity': quantity}]},
+            content_type='application/json',
+            headers={'Idempotency-Key': key},
+        )
+
+    def test_retry_replays_the_original_response(self):
+        first = self.post_order('retry-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            retry = self.post_order('retry-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_count, 8)
+
+    def test_reusing_a_key_for_another_request_is_rejected(self):
+        self.post_order('reused')
+        response = self.post_order('reused', quantity=3)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_requests_are_not_stored(self):
+        self.assertEqual(self.post_order('too-many', quantity=50).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self.post_order('old')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post_order('old').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge_expired(), 1)
+
+
+class APIKeyAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='integrator')
+
+    def setUp(self):
+        apikeys.clear_cache()
+        self.api_key, self.key = apikeys.create_key(self.user, name='tests')
+
+    def post_product(self, key):
+        # An authenticated request gets as far as validation
+        return self.client.post('/api/products/', {}, headers={'Authorization': f'Api-Key {key}'})
+
+    def test_valid_key_authenticates_and_only_its_hash_is_stored(self):
+        self.assertEqual(self.post_product(self.key).status_code, 400)
+        stored = APIKey.objects.get(pk=self.api_key.pk)
+        self.assertEqual(stored.key_hash, apikeys.hash_key(self.key))
+        self.assertNotIn(self.key.split('.')[1], stored.key_hash)
+        self.assertIsNotNone(stored.last_used_at)
+
+    def test_bad_keys_are_rejected(self):
+        prefix = self.key.split('.')[0]
+        for key in [f'{prefix}.wrong-secret', 'unknown.secret', prefix, 'a b']:
+            self.assertEqual(self.post_product(key).status_code, 403, key)
+        self.assertEqual(self.post_product(self.key).status_code, 400)
+
+    def test_verification_is_cached(self):
+        self.assertEqual(apikeys.verify(self.key).user, self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(apikeys.verify(self.key).pk, self.api_key.pk)
+            self.assertIsNone(apikeys.verify(self.key[:-1] + '!'))
+
+    def test_cache_entries_expire(self):
+        with override_settings(API_KEY_CACHE_TTL=0):
+            apikeys.verify(self.key)
+            # Looked up and last_used_at bumped again
+            with self.assertNumQueries(2):
+                self.assertIsNotNone(apikeys.verify(self.key))
+
+    def test_revoked_expired_and_inactive_keys_stop_working_at_once(self):
+        self.assertEqual(self.post_product(self.key).status_code, 400)
+        apikeys.revoke(self.api_key)
+        self.assertEqual(self.post_product(self.key).status_code, 403)
+
+        api_key, key = apikeys.create_key(self.user, expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(apikeys.verify(key))
+
+        _, key = apikeys.create_key(self.user)
+        self.assertIsNotNone(apikeys.verify(key))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(apikeys.verify(key))
+
+
+class JobQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(id=1, username='buyer', email='buyer@example.com')
+        cls.product = Product.objects.create(name='Widget', price=5, stock_count=10)
+
+    def setUp(self):
+        self.calls = []
+
+        @jobs.task(name='test_flaky', max_attempts=2)
+        def flaky(**payload):
+            self.calls.append(payload)
+            raise RuntimeError('carrier timeout')
+
+        self.addCleanup(jobs.TASKS.pop, 'test_flaky')
+
+    def place(self):
+        return place_order(self.user, [{'product_id': self.product.id, 'quantity': 1}])
+
+    def test_order_events_are_sent_by_the_worker(self):
+        order = self.place()
+        self.assertEqual(mail.outbox, [])
+        order.status = 'shipped'
+        order.save()
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox),
+            [f'We received your order #{order.id}', f'Your order #{order.id} has shipped']
+        )
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+
+    def test_posting_the_payment_page_does_not_confirm_the_order(self):
+        order = self.place()
+        jobs_before = Job.objects.count()
+        response = self.client.post(f'/api/order/{order.id}/')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Job.objects.count(), jobs_before)
+
+        jobs.run_pending()
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+        self.assertEqual(order.reservations.get().status, StockReservation.HELD)
+
+    def test_failed_jobs_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue('test_flaky', sku=7)
+        with mock.patch.object(jobs, 'backoff', return_value=60):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('carrier timeout', job.last_error)
+        # Not due again until the backoff has passed
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(self.calls, [{'sku': 7}, {'sku': 7}])
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        jobs.enqueue('test_flaky')
+        self.assertEqual(len(jobs.claim('worker-a', 10)), 1)
+        self.assertEqual(jobs.claim('worker-b', 10), [])
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(len(jobs.claim('worker-b', 10)), 1)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    @mock.patch('ecommerce.replicas.replica_configured', return_value=True)
+    def test_only_marked_shop_reads_use_the_replica(self, configured):
+        self.assertIsNone(self.router.db_for_read(Product))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_read(SalesDailyRollup), 'replica')
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertIsNone(self.router.db_for_read(APIKey))
+            self.assertIsNone(self.router.db_for_read(Order))
+            self.assertIsNone(self.router.db_for_write(Product))
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    @mock.patch('ecommerce.replicas.replica_configured', return_value=False)
+    def test_reads_stay_on_the_primary_without_a_replica(self, configured):
+        with use_replica():
+            self.assertIsNone(self.router.db_for_read(Product))
+
+
+class ReplicaDatabaseTests(TestCase):
+    """Catalog reads against a replica that is a separate, lagging SQLite file."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, and before TestCase opens its
+        # transactions, since the test runner only creates configured aliases
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        connections.settings['replica'] = dict(
+            connections['default'].settings_dict, NAME=os.path.join(directory.name, 'replica.sqlite3')
+        )
+        cls.addClassCleanup(cls.remove_replica)
+        # Replication hasn't caught up: the tables exist but hold no rows yet
+        with connections['replica'].schema_editor() as editor:
+            for model in (User, Product, ProductAttribute, APIKey):
+                editor.create_model(model)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def remove_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        apikeys.clear_cache()
+        self.addCleanup(apikeys.clear_cache)
+        self.user = User.objects.create(username='integrator')
+        Product.objects.create(name='Desk lamp', price=20)
+        caches['catalog'].clear()
+
+    def test_catalog_reads_use_the_replica_but_api_keys_stay_on_the_primary(self):
+        _, key = apikeys.create_key(self.user)
+        response = self.client.get('/api/products/', headers={'Authorization': f'Api-Key {key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_a_revoked_key_is_rejected_before_the_replica_catches_up(self):
+        api_key, key = apikeys.create_key(self.user)
+        # The replica still has the key as it was before it was revoked
+        User.objects.using('replica').create(pk=self.user.pk, username=self.user.username)
+        APIKey.objects.using('replica').create(
+            user_id=self.user.pk, prefix=api_key.prefix, key_hash=api_key.key_hash
+        )
+        apikeys.revoke(api_key)
+        response = self.client.get('/api/products/', headers={'Authorization': f'Api-Key {key}'})
+        self.assertEqual(response.status_code, 403)
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        cls.kettle = Product.objects.create(name='Steel kettle', price=30, category='home_kitchen')
+        cls.lamp = Product.objects.create(name='Desk lamp', price=20, category='home_kitchen')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=User.objects.create(username=f'buyer-{Order.objects.count()}'))
+            OrderItem.objects.create(order=order, product=self.kettle, quantity=1, price=30)
+            Review.objects.create(product=self.lamp, user=order.user, rating=4)
+        return order
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [f'/admin/ecommerce/{model}/' for model in ('order', 'orderitem', 'review', 'product')]
+        self.add_orders(2)
+        before = [self.changelist_queries(url) for url in urls]
+        self.add_orders(6)
+        self.assertEqual([self.changelist_queries(url) for url in urls], before)
+
+    def test_searches_use_ids_and_the_product_index(self):
+        order = self.add_orders(3)
+        response = self.client.get(f'/admin/ecommerce/order/?q={order.pk}')
+        self.assertEqual(list(response.context_data['cl'].result_list), [order])
+        response = self.client.get(f'/admin/ecommerce/order/?q={order.user.username}')
+        self.assertEqual(list(response.context_data['cl'].result_list), [order])
+        response = self.client.get('/admin/ecommerce/orderitem/?q=kettle')
+        self.assertEqual(response.context_data['cl'].result_count, 3)
+        response = self.client.get('/admin/ecommerce/product/?q=desk')
+        self.assertEqual(list(response.context_data['cl'].result_list), [self.lamp])
+
+    def test_order_items_pick_products_with_autocomplete(self):
+        order = self.add_orders(1)
+        response = self.client.get(f'/admin/ecommerce/order/{order.pk}/change/')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, self.lamp.name)
+
+    def test_estimated_count_stops_at_the_cap(self):
+        order = self.add_orders(5)
+        with mock.patch.object(EstimatedCountPaginator, 'estimate_cap', 3):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('pk'), 2).count, 3)
+            self.assertEqual(EstimatedCountPaginator(Order.objects.filter(pk=order.pk).order_by('pk'), 2).count, 1)
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(40):
+            Product.objects.create(name=f'Compressible product {i}', price=i, category='books')
+
+    def setUp(self):
+        caches['catalog'].clear()
+
+    def test_accept_encoding_negotiation(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate', ('br', 'gzip')), 'gzip')
+        self.assertEqual(compression.choose_encoding('gzip;q=0.5, br', ('br', 'gzip')), 'br')
+        self.assertEqual(compression.choose_encoding('*', ('br', 'gzip')), 'br')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0, identity', ('br', 'gzip')))
+        self.assertIsNone(compression.choose_encoding('', ('br', 'gzip')))
+
+    def test_large_json_responses_are_compressed(self):
+        plain = self.client.get('/api/products/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        caches['catalog'].clear()
+        response = self.client.get('/api/products/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        # The weak ETag still revalidates against the catalog cache
+        response = self.client.get('/api/products/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_responses_are_left_alone(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/products/', headers={'Accept-Encoding': 'gzip'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streamed_exports_are_compressed(self):
+        plain = b''.join(self.client.get('/api/products/export/?output=csv').streaming_content)
+        response = self.client.get('/api/products/export/?output=csv', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+
+class StaticFilesTests(SimpleTestCase):
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+    }
+
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(self.root.cleanup)
+        os.makedirs(os.path.join(source.name, 'css'))
+        with open(os.path.join(source.name, 'css', 'site.css'), 'w') as f:
+            f.write('body { color: #333; }\n' * 200)
+        with open(os.path.join(source.name, 'robots.txt'), 'w') as f:
+            f.write('User-agent: *\n')
+
+        settings = override_settings(
+            STATIC_ROOT=self.root.name, STATICFILES_DIRS=[source.name], STORAGES=self.STORAGES,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root.name, 'staticfiles.json')) as f:
+            self.hashed_css = json.load(f)['paths']['css/site.css']
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        files = set(os.listdir(os.path.join(self.root.name, 'css')))
+        hashed = os.path.basename(self.hashed_css)
+        self.assertRegex(hashed, r'^site\.[0-9a-f]{12}\.css$')
+        self.assertIn(hashed + '.gz', files)
+        # Too small to be worth compressing
+        self.assertNotIn('robots.txt.gz', os.listdir(self.root.name))
+
+    def test_hashed_files_are_immutable_and_precompressed(self):
+        url = '/static/' + self.hashed_css
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['Content-Type'].startswith('text/css'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body, b'body { color: #333; }\n' * 200)
+
+        response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_files_get_a_short_max_age(self):
+        with override_settings(WHITENOISE_MAX_AGE=120):
+            response = self.client.get('/static/robots.txt', headers={'Accept-Encoding': 'gzip'})
+        self.assertIn('max-age=120', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.client.get('/static/missing.css').status_code, 404)
+        self.assertEqual(self.client.post('/static/robots.txt').status_code, 405)
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username='ops', is_staff=True)
+        cls.customer = User.objects.create(username='customer')
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_metrics_are_exported_in_prometheus_format(self):
+        self.client.get('/api/orders/')
+        self.client.get('/api/orders/')
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('shop_requests_total{view="order-list",method="GET",status="200"} 2', body)
+        self.assertIn('shop_request_db_queries_bucket{view="order-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('shop_request_render_seconds_count{view="order-list",method="GET"} 2', body)
+        self.assertIn('# TYPE shop_request_duration_seconds histogram', body)
+        self.assertIn('shop_catalog_cache_total{outcome="hit"}', body)
+
+    def test_metrics_need_staff_or_the_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get('/api/metrics/', headers={'Authorization': 'Bearer s3cret'})
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get('/api/metrics/', headers={'Authorization': 'Bearer wrong'})
+            self.assertEqual(response.status_code, 403)
+
+    def test_profile_mode_is_staff_only(self):
+        self.client.force_login(self.customer)
+        response = self.client.get('/api/orders/?profile=1')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/orders/?profile=1')
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('function calls', response.content.decode())
+
+
+class BenchmarkTests(TestCase):
+    def test_seeded_catalog_is_consistent_and_every_scenario_runs(self):
+        benchmarks.seed_catalog(products=40, orders=15, batch_size=10)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(reconcile_ratings(fix=False), 0)
+        self.assertEqual(rollups.sales_totals()[0], 15)
+
+        results = benchmarks.run_client_benchmark(requests=3, rounds=1, warmup=0)
+        self.assertEqual(len(results), 8)
+        for name, result in results.items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries'], 0, name)
+        # The benchmark's own orders are rolled back
+        self.assertEqual(Order.objects.count(), 15)
+
+    def test_compare_reports_regressions(self):
+        baseline = {'product-list': {
+            'throughput': 100.0, 'p95_ms': 10.0, 'queries': 2, 'errors': 0,
+        }}
+        steady = {'product-list': {'throughput': 90.0, 'p95_ms': 11.0, 'queries': 2, 'errors': 0}}
+        self.assertEqual(benchmarks.compare(steady, baseline), [])
+
+        slower = {'product-list': {'throughput': 50.0, 'p95_ms': 30.0, 'queries': 3, 'errors': 1}}
+        self.assertEqual(len(benchmarks.compare(slower, baseline)), 4)
+
+    def test_checked_in_baseline_covers_every_scenario(self):
+        with open(benchmarks.BASELINE_PATH) as f:
+            baseline = json.load(f)
+        names = [name for name, _ in benchmarks.scenarios(random.Random(0))]
+        self.assertEqual(sorted(baseline), sorted(names))
+        for name in names:
+            self.assertGreater(baseline[name]['throughput'], 0, name)
+            self.assertEqual(baseline[name]['errors'], 0, name)
+
+    def test_missing_baseline_fails_before_seeding(self):
+        missing = Path(tempfile.mkdtemp()) / 'baseline.json'
+        with mock.patch.object(benchmarks, 'seed_catalog') as seed_catalog:
+            with self.assertRaisesMessage(CommandError, f'Baseline {missing} does not exist'):
+                call_command('benchmark', baseline=missing, stdout=io.StringIO())
+            with mock.patch.object(benchmarks, 'BASELINE_PATH', missing):
+                with self.assertRaisesMessage(CommandError, '--save-baseline'):
+                    call_command('benchmark', stdout=io.StringIO())
+        seed_catalog.assert_not_called()
@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, OrderViewSet, dashboard_view, single_order_view
+from .views import ProductViewSet, OrderViewSet, dashboard_view, single_order_view, metrics_view
+from . import async_views
 
 # Option 1: Using Router (Recommended)
 router = DefaultRouter()
@@ -10,6 +11,12 @@ router.register(r'orders', OrderViewSet, basename='order')
 urlpatterns = [
     path('admin/dashboard/', dashboard_view, name='dashboard'),
     path('order/<int:order_id>/', single_order_view, name='single_order'),
+    path('metrics/', metrics_view, name='metrics'),
+    # Async (ASGI) read endpoints
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/search/', async_views.product_search, name='async-product-search'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/orders/<int:pk>/', async_views.order_detail, name='async-order-detail'),
 ] + router.urls
 
 # Option 2: Manual URL mapping
@@ -1,22 +1,32 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from .models import Product, Order, OrderItem
+from .models import Product, Order, OrderItem, Review
+from .filters import filter_product_list, filter_product_search
+from .pagination import KeysetOptInMixin, KeysetPagination
+from .orders import place_order, OrderPlacementError
+from . import importers, rollups, exports, metrics
+from .facets import product_facets
+from .idempotency import idempotent_response
+from .replicas import ReplicaReadMixin, use_replica
+from . import cache as catalog_cache
 from .serializers import (
-    ProductSummarySerializer, ProductDetailSerializer,
+    ProductSummarySerializer, ProductDetailSerializer, ReviewSerializer,
     OrderCreateSerializer, OrderStatusSerializer
 )
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.shortcuts import render
 from django.db import models
 from django.db.models import Sum, Count
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from django.shortcuts import redirect
 
 class ProductPagination(PageNumberPagination):
@@ -24,43 +34,39 @@ class ProductPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 100
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, KeysetOptInMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     pagination_class = ProductPagination
     filter_backends = [filters.OrderingFilter]
-    ordering_fields = ['name', 'price', 'created_at']
+    ordering_fields = ['name', 'price', 'created_at', 'rating_avg']
     ordering = ['-created_at']  # Default ordering
     
+    # Serialize listings from .values() rows instead of model instances
+    fast_serialization = True
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProductDetailSerializer
         return ProductSummarySerializer
     
-    def list(self, request):
-        queryset = self.get_queryset()
-        category = request.query_params.get('category')
-        search = request.query_params.get('search')
-        
-        if category:
-            queryset = queryset.filter(category=category)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
-            
-        # Apply ordering
-        ordering = request.query_params.get('ordering', '-created_at')
-        if ordering:
-            queryset = queryset.order_by(ordering)
-            
+    def summary_response(self, queryset):
+        if self.fast_serialization:
+            queryset = ProductSummarySerializer.values_queryset(queryset)
+            serialize = ProductSummarySerializer.fast_data
+        else:
+            serialize = lambda rows: self.get_serializer(rows, many=True).data
+
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            return self.get_paginated_response(serialize(page))
+        return Response(serialize(queryset))
     
+    @catalog_cache.cached_catalog_response('product-list')
+    def list(self, request):
+        queryset = filter_product_list(self.get_queryset(), request.query_params)
+        return self.summary_response(queryset)
+    
+    @catalog_cache.cached_catalog_response('product-detail')
     def retrieve(self, request, pk=None):
         try:
             product = self.get_object()
@@ -72,42 +78,83 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
+        if not Product.objects.filter(pk=pk).exists():
+            return Response(
+                {'error': 'Product not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        queryset = Review.objects.filter(product_id=pk).select_related('user')
+        paginator = KeysetPagination(ordering='-date')
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
     @action(detail=False, methods=['get'])
+    @catalog_cache.cached_catalog_response('product-search')
     def search(self, request):
-        query = request.query_params.get('q', '')
-        category = request.query_params.get('category')
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        
-        queryset = self.get_queryset()
-        
-        if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(category__icontains=query) |
-                Q(specifications__icontains=query)
-            )
-        
-        if category:
-            queryset = queryset.filter(category=category)
-            
-        if min_price:
-            queryset = queryset.filter(price__gte=float(min_price))
-            
-        if max_price:
-            queryset = queryset.filter(price__lte=float(max_price))
-            
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-            
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = filter_product_search(self.get_queryset(), request.query_params)
+        return self.summary_response(queryset)
+    
+    @action(detail=False, methods=['get'])
+    @catalog_cache.cached_catalog_response('product-facets', whole_catalog=True)
+    def facets(self, request):
+        """
+        Category counts, price histogram and in-stock counts for the search
+        filters (``q``, ``min_price``, ``max_price``, ``spec.*``) in one
+        grouped query.
+        """
+        params = request.query_params.copy()
+        params.pop('category', None)
+        queryset = filter_product_search(self.get_queryset(), params)
+        return Response(product_facets(queryset, category=request.query_params.get('category')))
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return exports.export_response(
+            request, Product.objects.all(),
+            exports.iter_products_ndjson, exports.iter_products_csv, 'products'
+        )
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(catalog_cache.stats())
     
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def bulk_create(self, request):
+        """
+        Import products in chunks inside one transaction. Accepts a JSON
+        list, or a streamed NDJSON/CSV body which is read line by line.
+        """
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', importers.DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = importers.DEFAULT_CHUNK_SIZE
+        chunk_size = max(1, min(chunk_size, importers.MAX_CHUNK_SIZE))
+
+        content_type = (request.content_type or '').split(';')[0].strip()
+        if content_type in importers.NDJSON_CONTENT_TYPES + importers.CSV_CONTENT_TYPES:
+            # DRF leaves request.stream unset without a Content-Length, as
+            # with a chunked upload; the Django request reads whatever body
+            # the server passes on
+            stream = request.stream if request.stream is not None else request._request
+            if content_type in importers.CSV_CONTENT_TYPES:
+                rows = importers.iter_csv(stream)
+            else:
+                rows = importers.iter_ndjson(stream)
+            try:
+                created = importers.import_products(rows, chunk_size=chunk_size)
+            except importers.ProductImportError as e:
+                return self._import_error_response(e)
+            if not created:
+                # Also what a WSGI server that drops chunked bodies looks like
+                return Response(
+                    {'error': 'No products in the request body'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({'created': created}, status=status.HTTP_201_CREATED)
+
         products_data = request.data
         if not isinstance(products_data, list):
             return Response(
@@ -115,29 +162,30 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        created_products = []
         try:
-            for product_data in products_data:
-                serializer = ProductDetailSerializer(data=product_data)
-                serializer.is_valid(raise_exception=True)
-                product = serializer.save()
-                created_products.append(product)
-
-            return Response(
-                ProductSummarySerializer(created_products, many=True).data,
-                status=status.HTTP_201_CREATED
-            )
-        except Exception as e:
-            # Rollback any created products if there's an error
-            for product in created_products:
-                product.delete()
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
+            _, created_products = importers.import_products(
+                products_data, chunk_size=chunk_size, collect=True
             )
+        except importers.ProductImportError as e:
+            return self._import_error_response(e)
+        return Response(
+            ProductSummarySerializer(created_products, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def _import_error_response(self, error):
+        return Response(
+            {
+                'error': f'{error.error_count} invalid rows, nothing was imported',
+                'errors': error.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(KeysetOptInMixin, viewsets.ModelViewSet):
     permission_classes = []
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -146,11 +194,16 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user_id = self.request.query_params.get('user_id')
-        queryset = Order.objects.all()
+        # Items and their products are loaded in two batched queries for the
+        # whole page rather than once per order
+        queryset = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
         if user_id:
             queryset = queryset.filter(user_id=user_id)
         return queryset
     
+    @idempotent_response('order-create')
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -158,68 +211,33 @@ class OrderViewSet(viewsets.ModelViewSet):
         user = get_object_or_404(User, id=1)
         
         try:
-            order = Order.objects.create(
-                user=user 
-            )
-            if request.data.get('shipping_address'):
-                order.shipping_address = request.data.get('shipping_address')
-                order.save()
-            
-            total_amount = 0
-            products_data = serializer.validated_data.get('products', [])
-            
-            if not products_data:
-                order.delete()
-                return Response(
-                    {'error': 'At least one product is required'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            for item in products_data:
-                product = get_object_or_404(Product, id=item['product_id'])
-                quantity = item['quantity']
-                
-                if product.stock_count < quantity:
-                    order.delete()
-                    return Response(
-                        {
-                            'error': f'Insufficient stock for product {product.name}. '
-                                    f'Available: {product.stock_count}'
-                        }, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                price = product.price * quantity
-                total_amount += price
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=price
-                )
-                
-                product.stock_count -= quantity
-                product.save()
-            
-            order.total_amount = total_amount
-            order.save()
-            
-            return Response({
-                'order_id': order.id,
-                'status': order.status,
-                "response": "Make Payment at https://shop-production-b7d8.up.railway.app/api/order/" + str(order.id)
-                # 'estimated_delivery': order.estimated_delivery,
-                # 'tracking_number': order.tracking_number
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
-            if 'order' in locals():
-                order.delete()
-            return Response(
-                {'error': str(e)}, 
-                status=status.HTTP_400_BAD_REQUEST
+            order = place_order(
+                user,
+                serializer.validated_data.get('products', []),
+                shipping_address=request.data.get('shipping_address')
             )
+        except OrderPlacementError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        return Response({
+            'order_id': order.id,
+            'status': order.status,
+            "response": "Make Payment at https://shop-production-b7d8.up.railway.app/api/order/" + str(order.id)
+            # 'estimated_delivery': order.estimated_delivery,
+            # 'tracking_number': order.tracking_number
+        }, status=status.HTTP_201_CREATED)
+    
+    # Every customer's orders and shipping addresses, so staff only
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        queryset = Order.objects.all()
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+        return exports.export_response(
+            request, queryset,
+            exports.iter_orders_ndjson, exports.iter_orders_csv, 'orders'
+        )
     
     def retrieve(self, request, pk=None):
         try:
@@ -232,16 +250,23 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+@use_replica()
 def dashboard_view(request):
-    total_orders = Order.objects.count()
-    recent_orders = Order.objects.filter(created_at__gte='2023-09-01').count()  # Example date
+    # Order totals come from the daily rollups, so this reads O(days) rows
+    # rather than scanning every order
+    try:
+        window_days = int(request.GET.get('days', 30))
+    except ValueError:
+        window_days = 30
+    window_days = max(1, min(window_days, 3650))
+
+    total_orders, total_revenue = rollups.sales_totals()
+    recent_orders, recent_revenue = rollups.sales_totals(days=window_days)
     total_products = Product.objects.count()
     out_of_stock = Product.objects.filter(stock_count=0).count()
-    total_revenue = Order.objects.aggregate(total=Sum('total_amount'))['total'] or 0
-    recent_revenue = Order.objects.filter(created_at__gte='2023-09-01').aggregate(total=Sum('total_amount'))['total'] or 0
     
     # Fetch the most recent orders
-    recent_orders_list = Order.objects.order_by('-created_at')[:5]  # Adjust the number as needed
+    recent_orders_list = Order.objects.select_related('user').order_by('-created_at')[:5]  # Adjust the number as needed
 
     context = {
         'total_orders': total_orders,
@@ -251,10 +276,25 @@ def dashboard_view(request):
         'total_revenue': total_revenue,
         'recent_revenue': recent_revenue,
         'recent_orders_list': recent_orders_list,  # Pass the recent orders to the context
+        'window_days': window_days,
     }
     
     return render(request, 'admin/dashboard.html', context)
 
+def metrics_view(request):
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    allowed = request.user.is_staff or (
+        settings.METRICS_TOKEN and constant_time_compare(token, settings.METRICS_TOKEN)
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    cache_stats = catalog_cache.stats()
+    body = metrics.REGISTRY.render(extra=[(
+        'shop_catalog_cache_total', 'counter', 'Catalog cache lookups by outcome.',
+        [((('outcome', outcome),), count) for outcome, count in cache_stats.items()]
+    )])
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @require_http_methods(["GET", "POST"])
 def single_order_view(request, order_id):
     order = get_object_or_404(Order, id=order_id)
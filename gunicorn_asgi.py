@@ -0,0 +1,29 @@
+"""
+Gunicorn profile for serving the project over ASGI with uvicorn workers.
+
+    gunicorn shop.asgi:application -c gunicorn_asgi.py
+
+(also available as Procfile.asgi). The async read endpoints under
+/api/async/ then run on the event loop, so many slow requests can be in
+flight per worker; the synchronous DRF views keep working and are run in
+a thread by Django.
+
+Compare the two deployment profiles with the load test command, running
+the WSGI profile (Procfile) on one port and this one on another:
+
+    python manage.py loadtest http://127.0.0.1:8000/api/products/ \\
+        http://127.0.0.1:8001/api/async/products/ --concurrency 10 50 200
+
+Settings can be overridden through the usual GUNICORN_CMD_ARGS or the
+WEB_CONCURRENCY / PORT environment variables.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Async workers hold many connections each, so keep-alive is cheap
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
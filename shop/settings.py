@@ -61,12 +61,17 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Answers /static/ requests before anything else runs
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'ecommerce.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After AuthenticationMiddleware, which ?profile=1 needs
+    'ecommerce.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'shop.urls'
@@ -92,24 +97,148 @@ WSGI_APPLICATION = 'shop.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'ecommerce.apikeys.APIKeyAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson-backed, same output as DRF's JSON classes; see ecommerce/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'ecommerce.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ecommerce.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Configured from DB_* variables, e.g. DB_ENGINE=postgresql DB_NAME=shop
+# DB_HOST=... DB_USER=... DB_PASSWORD=... Setting DB_REPLICA_NAME (and the
+# other DB_REPLICA_* variables as needed) adds a read replica that serves
+# catalog reads and the dashboard; see ecommerce/replicas.py.
+
+SQLITE_PRAGMAS = [
+    # Readers don't block the writer and vice versa
+    'PRAGMA journal_mode=WAL',
+    # Safe with WAL; only the last commits can be lost on power failure
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+]
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _database(prefix, default_name):
+    engine = os.environ.get(f'{prefix}_ENGINE', 'sqlite3')
+    if '.' not in engine:
+        engine = f'django.db.backends.{engine}'
+    database = {
+        'ENGINE': engine,
+        'NAME': os.environ.get(f'{prefix}_NAME', default_name),
+        'CONN_MAX_AGE': int(os.environ.get(f'{prefix}_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': _env_bool(f'{prefix}_CONN_HEALTH_CHECKS', True),
+    }
+    if engine == 'django.db.backends.sqlite3':
+        database['OPTIONS'] = {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            # Seconds to wait for a lock before raising "database is locked"
+            'timeout': int(os.environ.get(f'{prefix}_BUSY_TIMEOUT', 20)),
+            # Take the write lock when the transaction starts, so two
+            # transactions can't both read and then fail to upgrade
+            'transaction_mode': 'IMMEDIATE',
+        }
+    else:
+        database.update({
+            'USER': os.environ.get(f'{prefix}_USER', ''),
+            'PASSWORD': os.environ.get(f'{prefix}_PASSWORD', ''),
+            'HOST': os.environ.get(f'{prefix}_HOST', ''),
+            'PORT': os.environ.get(f'{prefix}_PORT', ''),
+        })
+    return database
+
+
 DATABASES = {
+    'default': _database('DB', BASE_DIR / 'db.sqlite3'),
+}
+
+if os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = _database('DB_REPLICA', None)
+    # Tests run against the primary's test database only
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['ecommerce.replicas.ReplicaRouter']
+
+
+# Caches
+# The catalog cache holds product list/detail responses. 'locmem' is a
+# per-process LRU; use 'file' or 'db' (run createcachetable first) to share
+# it between gunicorn workers.
+CATALOG_CACHE_BACKEND = os.environ.get('CATALOG_CACHE_BACKEND', 'locmem')
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 300))
+
+_CATALOG_CACHES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 10},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'catalog')),
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'ecommerce_catalog_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 10},
+    },
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': _CATALOG_CACHES[CATALOG_CACHE_BACKEND],
 }
 
 
+# Stock reservations
+# Seconds a pending order holds its stock before release_expired_reservations
+# puts the stock back. The order itself stays pending.
+STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', 15 * 60))
+
+
+# Metrics
+# /api/metrics/ is open to staff users, and to scrapers sending
+# "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Email
+# Order notifications are sent by the job worker (manage.py runworker)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+
+
+# API keys
+# Seconds a verified API key is trusted without checking the database again.
+# Also the longest a key revoked in one worker process keeps working in the
+# others.
+API_KEY_CACHE_TTL = int(os.environ.get('API_KEY_CACHE_TTL', 60))
+
+
+# Idempotency keys
+# Seconds a stored Idempotency-Key response is replayed for
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -150,6 +279,26 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static')
 ]
 
+# With STATIC_MANIFEST=1 collectstatic writes content-hashed names plus
+# .gz/.br copies, which WhiteNoise serves as immutable (see the release step
+# in the Procfiles). It is on by default once such a collectstatic has
+# written its manifest. Files without a hash in their name are cached for
+# WHITENOISE_MAX_AGE seconds.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage'
+            if _env_bool('STATIC_MANIFEST', os.path.exists(os.path.join(STATIC_ROOT, 'staticfiles.json')))
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+WHITENOISE_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 60 * 60))
+
+# Responses smaller than this aren't compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
 # Media files (Uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')